@@ -9,7 +9,9 @@ fi
 # Optional: prebuild or seed RAG index if script exists
 if [ -n "$RAG_SEED_PATH" ] && [ -f "$RAG_SEED_PATH" ]; then
   echo "[entrypoint] seeding RAG from $RAG_SEED_PATH"
-  python -c "from src.rag.rag_pipeline import RAGPipeline; rp=RAGPipeline(); rp.build_store_from_pdf('$RAG_SEED_PATH'); import pickle; pickle.dump(rp.store, open('/app/rag_index/store.pkl','wb'))" || true
+  # add_documents() persists the index to $RAG_INDEX_DIR (default /app/rag_index);
+  # workers then memory-map it at startup instead of re-embedding
+  python -c "from src.rag.rag_pipeline import RAGPipeline; RAGPipeline().add_documents(['$RAG_SEED_PATH'])" || true
 fi
 
 # Run gunicorn with uvicorn workers
@@ -8,6 +8,27 @@ import './App.css'
 
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'https://huggingface.co/spaces/AryanDhanuka10/AI_Chat'
 
+// Uploads are indexed by a background job: poll until it finishes
+const JOB_POLL_INTERVAL_MS = 1000
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000
+
+const waitForIngestionJob = async (jobId) => {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS
+  while (Date.now() < deadline) {
+    const response = await fetch(`${BACKEND_URL}/upload/jobs/${jobId}`)
+    if (!response.ok) {
+      throw new Error(`Could not check ingestion job ${jobId}`)
+    }
+    const job = await response.json()
+    if (job.status === 'done') return job
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Ingestion failed')
+    }
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+  }
+  throw new Error('Timed out waiting for the document to be indexed')
+}
+
 function App() {
   const [sessionId] = useState(`session-${Date.now()}`)
   const [domain, setDomain] = useState('General')
@@ -236,17 +257,20 @@ function App() {
           signal: uploadAbortController.signal,
         })
 
+        // 202 {job_id, status, uploads: [{filename, saved_to, ...} | {filename, error}]}
+        const data = await response.json().catch(() => ({}))
         if (!response.ok) {
-          throw new Error(`Failed to upload ${file.name}`)
+          const rejected = data.uploads?.find(u => u.error)
+          throw new Error(rejected?.error || data.detail || `Failed to upload ${file.name}`)
         }
 
-        const data = await response.json()
-
-        // Store file metadata from backend response
+        const upload = data.uploads?.[0] || {}
         uploadedFileMetadata.push({
-          filename: data.filename || file.name,
-          chunks: data.chunks || 0,
-          savedTo: data.saved_to || '',
+          jobId: data.job_id,
+          filename: upload.filename || file.name,
+          chunks: 0,
+          savedTo: upload.saved_to || '',
+          duplicate: Boolean(upload.duplicate),
           uploadedAt: new Date().toISOString(),
           size: file.size,
           type: file.type
@@ -254,13 +278,20 @@ function App() {
       }
 
       clearTimeout(timeoutId)
+      showToast(`Uploaded ${files.length} file(s), indexing…`, 'success')
+
+      // One file per request, so the job's chunk count is the file's
+      for (const meta of uploadedFileMetadata) {
+        const job = await waitForIngestionJob(meta.jobId)
+        meta.chunks = job.chunks || 0
+      }
 
       // Update state and localStorage
       const updatedFiles = [...uploadedFiles, ...uploadedFileMetadata]
       setUploadedFiles(updatedFiles)
       localStorage.setItem('uploadedFiles', JSON.stringify(updatedFiles))
 
-      showToast(`Successfully uploaded ${files.length} file(s)`, 'success')
+      showToast(`Indexed ${files.length} file(s)`, 'success')
     } catch (error) {
       clearTimeout(timeoutId)
       console.error('Upload error:', error)
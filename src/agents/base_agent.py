@@ -3,15 +3,28 @@
 Defines BaseAgent for structured LLM interaction:
 - Optional RAG enrichment
 - Domain-specific prompt templates
-- Unified LLM generate() interface
+- Unified LLM generate() / stream() interface (sync + async)
+
+Prompts go to the LLM as chat messages (static system block, memory
+turns, then knowledge + query) so providers can reuse the cached prefix.
+
+Callers that already ran retrieval (e.g. concurrently with routing, see
+MultiDomainAssistant) pass the hits in; they are trimmed to this agent's
+budget exactly as its own search would have been.
 """
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from src.agents.prompts.base_prompt import BasePromptTemplate
 from src.models.llm import LLM
+from src.utils.context_budget import domain_budget, fit_context
+from src.utils.tokens import count_tokens
+
+# (chunk, score, metadata) as returned by RAGPipeline.search()
+Hit = Tuple[str, float, Dict]
 
 
 class BaseAgent:
@@ -23,6 +36,9 @@ class BaseAgent:
     - Invoke the LLM and return structured output.
     """
 
+    # Domain key used for the prompt token budget (set by subclasses)
+    domain = "general"
+
     def __init__(
         self,
         prompt_template: BasePromptTemplate,
@@ -33,58 +49,215 @@ class BaseAgent:
         Args:
         ----
             prompt_template: Domain-specific builder implementing build_prompt().
-            rag: Optional RAG pipeline (must expose query(text) -> List[str]).
+            rag: Optional RAG pipeline exposing
+                search(text, max_tokens=...) -> List[(chunk, score, metadata)].
 
         """
         self.llm = LLM()
         self.prompt_template = prompt_template
         self.rag = rag
+        self._overhead: Optional[int] = None
 
     def enable_rag(self, rag_pipeline) -> None:
         """Attach a RAG pipeline to this agent at runtime.
 
         Args:
         ----
-            rag_pipeline: Object exposing .query(text) -> List[str].
+            rag_pipeline: Object exposing .search(text, max_tokens=...).
 
         """
         self.rag = rag_pipeline
 
-    def run(self, query: str, context: Optional[Dict] = None) -> str:
-        """Execute the full agent pipeline:
-        1. RAG retrieval (optional)
-        2. Prompt construction
-        3. LLM call
+    def retrieval_budget(self) -> int:
+        """Most tokens of retrieved knowledge a prompt of this agent can hold."""
+        return domain_budget(self.domain) - self._template_overhead()
+
+    def retrieve(self, query: str) -> List[Hit]:
+        """RAG hits for query within retrieval_budget() (empty without RAG)."""
+        if self.rag is None:
+            return []
+        # Only relevant hits (min score), never more than the budget
+        return self.rag.search(query, max_tokens=self.retrieval_budget())
+
+    def _within_budget(self, hits: List[Hit]) -> List[Hit]:
+        """Hits retrieved for a larger budget, cut like search(max_tokens=...)."""
+        limit = self.retrieval_budget()
+        kept: List[Hit] = []
+        used = 0
+        for hit in hits:
+            cost = count_tokens(hit[0])
+            if used + cost > limit:
+                continue
+            kept.append(hit)
+            used += cost
+        return kept
+
+    def _prepare(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> Tuple[str, Dict]:
+        """Run RAG retrieval (optional) and fit everything into the budget.
+
+        Memory, retrieved knowledge and the query are fitted into the
+        domain's token budget before rendering.
 
         Args:
         ----
             query: Incoming user question.
             context: Memory + agent state dictionary.
+            hits: Hits already retrieved for query (skips the search).
 
         Returns:
         -------
-            str: The LLM-generated output.
+            (query enriched with the retrieved knowledge, fitted context)
 
         """
-        enriched_query = query
+        context = dict(context or {})
+        retrieved_chunks: List[str] = []
+        rag_error = None
 
         if self.rag is not None:
             try:
-                retrieved_chunks: List[str] = self.rag.query(query)
-                if retrieved_chunks:
-                    knowledge = "\n\n".join(retrieved_chunks)
-                    enriched_query = (
-                        f"Relevant Knowledge:\n{knowledge}\n\n" f"User Query:\n{query}"
-                    )
+                if hits is None:
+                    hits = self.retrieve(query)
+                else:
+                    hits = self._within_budget(hits)
+                retrieved_chunks = [text for text, _, _ in hits]
             except Exception as exc:
                 # Fail gracefully — never break the pipeline
-                enriched_query = (
-                    f"[RAG Retrieval Failed: {exc}]\n\nUser Query:\n{query}"
-                )
+                rag_error = exc
+
+        fitted_query, memory, knowledge = fit_context(
+            domain_budget(self.domain),
+            query,
+            context.get("memory", []),
+            retrieved_chunks,
+            overhead=self._template_overhead(),
+        )
+        context["memory"] = memory
 
-        prompt = self.prompt_template.build_prompt(
-            enriched_query,
-            context or {},
+        enriched_query = fitted_query
+        if knowledge:
+            knowledge_text = "\n\n".join(knowledge)
+            enriched_query = (
+                f"Relevant Knowledge:\n{knowledge_text}\n\n"
+                f"User Query:\n{fitted_query}"
+            )
+        elif rag_error is not None:
+            enriched_query = (
+                f"[RAG Retrieval Failed: {rag_error}]\n\nUser Query:\n{fitted_query}"
+            )
+
+        return enriched_query, context
+
+    def build_prompt(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> str:
+        """Run RAG retrieval (optional) and render the final LLM prompt.
+
+        Args:
+        ----
+            query: Incoming user question.
+            context: Memory + agent state dictionary.
+            hits: Hits already retrieved for query (skips the search).
+
+        Returns:
+        -------
+            str: The prompt as one string.
+
+        """
+        return self.prompt_template.build_prompt(
+            *self._prepare(query, context, hits)
+        )
+
+    def build_messages(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> List[Dict[str, str]]:
+        """Same as build_prompt(), as the chat messages sent to the LLM."""
+        return self.prompt_template.build_messages(
+            *self._prepare(query, context, hits)
         )
 
-        return self.llm.generate(prompt)
+    def _template_overhead(self) -> int:
+        """Tokens taken by the template's fixed instructions (computed once)."""
+        if self._overhead is None:
+            self._overhead = count_tokens(self.prompt_template.build_prompt("", {}))
+        return self._overhead
+
+    def run(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> str:
+        """Execute the full agent pipeline:
+        1. RAG retrieval (optional)
+        2. Prompt construction
+        3. LLM call
+
+        Args:
+        ----
+            query: Incoming user question.
+            context: Memory + agent state dictionary.
+            hits: Hits already retrieved for query (skips the search).
+
+        Returns:
+        -------
+            str: The LLM-generated output.
+
+        """
+        messages = self.build_messages(query, context, hits)
+        return self.llm.generate(messages)
+
+    def stream(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> Iterator[str]:
+        """Same pipeline as run(), but yields tokens as the LLM produces them.
+
+        Args:
+        ----
+            query: Incoming user question.
+            context: Memory + agent state dictionary.
+            hits: Hits already retrieved for query (skips the search).
+
+        Yields:
+        ------
+            str: Content deltas from the provider stream.
+
+        """
+        messages = self.build_messages(query, context, hits)
+        yield from self.llm.stream(messages)
+
+    async def arun(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> str:
+        """Async run(): RAG + prompt building go to a worker thread (embedding
+        is CPU-bound), the LLM call is awaited on the event loop.
+        """
+        messages = await asyncio.to_thread(self.build_messages, query, context, hits)
+        return await self.llm.agenerate(messages)
+
+    async def astream(
+        self,
+        query: str,
+        context: Optional[Dict] = None,
+        hits: Optional[List[Hit]] = None,
+    ) -> AsyncIterator[str]:
+        """Async stream(): yields tokens without blocking the event loop."""
+        messages = await asyncio.to_thread(self.build_messages, query, context, hits)
+        async for token in self.llm.astream(messages):
+            yield token
@@ -9,5 +9,7 @@ from src.agents.prompts.coding_prompt import CodingPrompt
 class CodingAgent(BaseAgent):
     """Agent for coding, debugging & software-related tasks."""
 
+    domain = "coding"
+
     def __init__(self) -> None:
         super().__init__(prompt_template=CodingPrompt())
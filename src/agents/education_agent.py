@@ -9,5 +9,7 @@ from src.agents.prompts.education_prompt import EducationPrompt
 class EducationAgent(BaseAgent):
     """Agent for education & explanation tasks."""
 
+    domain = "education"
+
     def __init__(self) -> None:
         super().__init__(prompt_template=EducationPrompt())
@@ -9,5 +9,7 @@ from src.agents.prompts.general_prompt import GeneralPrompt
 class GeneralAgent(BaseAgent):
     """Fallback general-purpose assistant."""
 
+    domain = "general"
+
     def __init__(self) -> None:
         super().__init__(prompt_template=GeneralPrompt())
@@ -9,5 +9,7 @@ from src.agents.prompts.legal_prompt import LegalPrompt
 class LegalAgent(BaseAgent):
     """Agent for legal information responses."""
 
+    domain = "legal"
+
     def __init__(self) -> None:
         super().__init__(prompt_template=LegalPrompt())
@@ -9,5 +9,7 @@ from src.agents.prompts.medical_prompt import MedicalPrompt
 class MedicalAgent(BaseAgent):
     """Agent for safe, non-prescriptive medical explanations."""
 
+    domain = "medical"
+
     def __init__(self) -> None:
         super().__init__(prompt_template=MedicalPrompt())
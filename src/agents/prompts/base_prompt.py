@@ -1,14 +1,53 @@
-"""Base Prompt Template (Abstract Class)"""
+"""Base Prompt Template (Abstract Class)
+
+Templates describe a fixed system block (``system_prompt``) and a closing
+instruction (``answer_instruction``). build_messages() renders them as a
+chat message list — static system message first, then memory turns, then
+the query — so the unchanging prefix can be reused by provider-side
+prompt caching. build_prompt() renders the same content as one string.
+"""
 
 from __future__ import annotations
-from abc import ABC, abstractmethod
-from typing import Dict
+from abc import ABC
+from typing import Dict, List
+
+# Memory lines are "User: ..." / "Assistant: ..." (see ContextManager)
+_MEMORY_ROLES = (("User: ", "user"), ("Assistant: ", "assistant"))
 
 
 class BasePromptTemplate(ABC):
     """All domain prompt templates must extend this class."""
 
-    @abstractmethod
+    # Fixed instructions (identical for every request of the domain)
+    system_prompt: str = ""
+    # Closing line after the user query
+    answer_instruction: str = "Provide the final answer:"
+
     def build_prompt(self, query: str, context: Dict) -> str:
-        """Build final LLM prompt using query + context."""
-        raise NotImplementedError
+        """Build final LLM prompt using query + context (single string)."""
+        memory = "\n".join(context.get("memory", []))
+
+        return (
+            f"{self.system_prompt}\n\n"
+            f"Conversation Memory:\n{memory}\n\n"
+            f"User Query:\n{query}\n\n"
+            f"{self.answer_instruction}"
+        )
+
+    def build_messages(self, query: str, context: Dict) -> List[Dict[str, str]]:
+        """Build chat messages: system block, memory turns, then the query."""
+        messages = [{"role": "system", "content": self.system_prompt}]
+
+        for line in context.get("memory", []):
+            for prefix, role in _MEMORY_ROLES:
+                if line.startswith(prefix):
+                    messages.append({"role": role, "content": line[len(prefix) :]})
+                    break
+            else:
+                # e.g. the running summary of older turns
+                messages.append({"role": "system", "content": line})
+
+        messages.append(
+            {"role": "user", "content": f"{query}\n\n{self.answer_instruction}"}
+        )
+        return messages
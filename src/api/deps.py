@@ -1,14 +1,107 @@
 """Module: deps.
 
-Holds global dependency objects like the singleton MultiDomainAssistant.
+Holds global dependency objects like the singleton MultiDomainAssistant,
+plus the background warm-up that loads it (and its models) after boot so
+/health answers at once and /ready reports when everything is loaded.
 """
 
+import asyncio
+import logging
+import os
+import threading
+import time
 from functools import lru_cache
+from typing import Dict, Optional
 
 from src.main import MultiDomainAssistant
+from src.models import client_pool
+from src.rag.ingestion import IngestionQueue
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+_assistant: Optional[MultiDomainAssistant] = None
+_assistant_lock = threading.Lock()
 
 
-@lru_cache(maxsize=1)
 def get_assistant() -> MultiDomainAssistant:
-    """Return singleton assistant instance."""
-    return MultiDomainAssistant()
+    """Return singleton assistant instance (built once, thread-safe)."""
+    global _assistant
+    if _assistant is None:
+        with _assistant_lock:
+            if _assistant is None:
+                _assistant = MultiDomainAssistant()
+    return _assistant
+
+
+@lru_cache(maxsize=1)
+def get_ingestion_queue() -> IngestionQueue:
+    """Return singleton ingestion queue feeding the assistant's RAG store."""
+    return IngestionQueue(
+        get_assistant().rag,
+        max_workers=int(os.getenv("INGEST_WORKERS", "2")),
+        max_pending=int(os.getenv("INGEST_MAX_PENDING", "32")),
+    )
+
+
+class Readiness:
+    """Progress of the background warm-up steps, for /ready."""
+
+    STEPS = ("assistant", "embedding_model", "llm_pool")
+
+    def __init__(self) -> None:
+        self.steps: Dict[str, str] = {step: "pending" for step in self.STEPS}
+        self.errors: Dict[str, str] = {}
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return all(status in ("done", "skipped") for status in self.steps.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "steps": dict(self.steps),
+            "errors": dict(self.errors),
+            "warmup_seconds": (
+                round(self.finished_at - self.started_at, 2)
+                if self.finished_at
+                else None
+            ),
+        }
+
+
+readiness = Readiness()
+
+
+async def _step(name: str, coro) -> None:
+    readiness.steps[name] = "running"
+    try:
+        await coro
+        readiness.steps[name] = "done"
+    except Exception as err:
+        readiness.steps[name] = "failed"
+        readiness.errors[name] = str(err)
+        LOGGER.error(f"Warm-up step {name} failed: {err}")
+
+
+async def warm_up() -> None:
+    """Build the assistant, load the embedding model and warm LLM pools.
+
+    Runs as a background task from the app's startup hook.
+    """
+    readiness.started_at = time.time()
+    await _step("assistant", asyncio.to_thread(get_assistant))
+    if readiness.steps["assistant"] == "done":
+        await _step("embedding_model", asyncio.to_thread(get_assistant().warm_up))
+    else:
+        readiness.steps["embedding_model"] = "failed"
+
+    if client_pool.LLM_WARMUP:
+        await _step("llm_pool", client_pool.awarm_up())
+    else:
+        readiness.steps["llm_pool"] = "skipped"
+
+    readiness.finished_at = time.time()
+    LOGGER.info(f"Warm-up finished: {readiness.to_dict()}")
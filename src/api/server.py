@@ -7,12 +7,18 @@ with RAG support and WebSocket streaming.
 
 from __future__ import annotations
 
+import asyncio
 import os
 import sys
+import time
+import uuid
+from typing import AsyncIterator, Dict, List
+
 import uvicorn
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 # ==========================================================
 # PATH FIX (for deployment & local execution consistency)
@@ -36,9 +42,11 @@ if ROOT_DIR not in sys.path:
 # INTERNAL IMPORTS
 # ==========================================================
 
-from src.api.deps import get_assistant
+from src.api.deps import get_assistant, get_ingestion_queue, readiness, warm_up
 from src.api.schemas import ChatRequest, ChatResponse
+from src.api.upload import UploadSizeLimit
 from src.api.upload import router as upload_router
+from src.models import client_pool
 
 # ==========================================================
 # FASTAPI APP CONFIG
@@ -50,6 +58,14 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Token coalescing for /stream: flush when either threshold is reached
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "32"))
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05"))
+
+# Reject oversized uploads before Starlette spools their body (added before
+# CORS so that middleware wraps it and the 413 carries CORS headers)
+app.add_middleware(UploadSizeLimit, path_prefix="/upload")
+
 # ==========================================================
 # CORS CONFIG
 # IMPORTANT: This FIXES your frontend fetch error
@@ -70,6 +86,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==========================================================
+# LIFECYCLE
+# ==========================================================
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Load the assistant, embedding model and LLM pools in the background so
+    # the worker starts serving /health at once; /ready tracks progress.
+    app.state.warm_up = asyncio.create_task(warm_up())
+
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await client_pool.aclose_all()
+
 # ==========================================================
 # ROUTERS
 # ==========================================================
@@ -85,17 +116,40 @@ app.include_router(upload_router, prefix="/upload")
 def health():
     return {"status": "ok"}
 
+
+@app.get("/ready")
+def ready():
+    """200 once the background warm-up has finished, 503 until then."""
+    state = readiness.to_dict()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+# ==========================================================
+# METRICS
+# ==========================================================
+
+@app.get("/metrics")
+async def metrics():
+    # Before warm-up has built them, these construct the assistant: off-loop
+    assistant = await asyncio.to_thread(get_assistant)
+    queue = await asyncio.to_thread(get_ingestion_queue)
+    return {
+        **await asyncio.to_thread(assistant.metrics),
+        "ingestion": queue.metrics(),
+    }
+
 # ==========================================================
 # REST CHAT ENDPOINT
 # ==========================================================
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    assistant = get_assistant()
+async def chat(req: ChatRequest):
+    # Builds (or waits for) the assistant during cold start: off the event loop
+    assistant = await asyncio.to_thread(get_assistant)
 
-    output = assistant.ask(
+    output = await assistant.aask(
         req.message,
         selected_domain=req.selected_domain,
+        session_id=req.session_id,
     )
 
     domain, confidence = extract_domain_meta(output)
@@ -116,10 +170,18 @@ def chat(req: ChatRequest):
 async def stream_chat(websocket: WebSocket):
     """
     Real-time streaming endpoint.
-    Sends responses line-by-line and terminates with [[END]].
+
+    Frames per message:
+    1. JSON meta frame: {"type": "meta", "domain": ..., "confidence": ...}
+    2. Text frames with tokens as the LLM produces them (coalesced)
+    3. "[[END]]"
+
+    Messages without a session_id share a memory private to this
+    connection, never one with other clients.
     """
     await websocket.accept()
-    assistant = get_assistant()
+    assistant = await asyncio.to_thread(get_assistant)
+    connection_session = uuid.uuid4().hex
 
     try:
         while True:
@@ -130,17 +192,57 @@ async def stream_chat(websocket: WebSocket):
                 await websocket.send_text("[[ERROR: empty message]]")
                 continue
 
-            full_output = assistant.ask(message)
-
-            for line in full_output.split("\n"):
-                if line.strip():
-                    await websocket.send_text(line)
+            events = assistant.aask_stream(
+                message,
+                selected_domain=req.get("selected_domain"),
+                session_id=req.get("session_id") or connection_session,
+            )
+
+            try:
+                await forward_stream(websocket, events)
+            except WebSocketDisconnect:
+                raise
+            except Exception as err:
+                await websocket.send_text(f"[[ERROR: {err}]]")
+                continue
 
             await websocket.send_text("[[END]]")
 
     except WebSocketDisconnect:
         print("WebSocket disconnected")
 
+
+async def forward_stream(websocket: WebSocket, events: AsyncIterator[Dict]):
+    """
+    Send assistant stream events to the socket.
+
+    Meta events go out as JSON immediately; tokens are coalesced into
+    small batches (STREAM_FLUSH_CHARS / STREAM_FLUSH_INTERVAL) so we
+    don't pay one frame per token.
+    """
+    buffer: List[str] = []
+    buffered = 0
+    last_flush = time.monotonic()
+
+    async for event in events:
+        if event["type"] == "meta":
+            await websocket.send_json(event)
+            continue
+
+        buffer.append(event["content"])
+        buffered += len(event["content"])
+
+        now = time.monotonic()
+        if (
+            buffered >= STREAM_FLUSH_CHARS
+            or now - last_flush >= STREAM_FLUSH_INTERVAL
+        ):
+            await websocket.send_text("".join(buffer))
+            buffer, buffered, last_flush = [], 0, now
+
+    if buffer:
+        await websocket.send_text("".join(buffer))
+
 # ==========================================================
 # METADATA PARSING HELPERS
 # ==========================================================
@@ -2,62 +2,298 @@
 
 File upload endpoint for RAG ingestion.
 Supports PDF and TXT documents.
+
+Files are saved and handed to a background ingestion job that indexes
+them into the shared RAG pipeline; the endpoint returns the job id at
+once and /upload/jobs/{job_id} reports progress.
+
+Files are stored under their content hash (<sha256 prefix>_<name>), so two
+different files with the same name never overwrite each other and a
+re-upload of the same bytes reuses the stored copy. The document id in the
+index stays uploaded_docs/<name>, so a new version of a file replaces the
+previous one's chunks; once it is indexed, the stored files of older
+versions are deleted (a re-upload of an old version makes it the newest).
+
+Uploads are copied to disk UPLOAD_CHUNK_BYTES at a time (never held in
+memory whole) and hashed on the way; a file over UPLOAD_MAX_BYTES fails
+the whole request with 413 and none of its files are kept. The hash
+travels with the ingestion job, so dedup doesn't read the file again.
+
+Note that Starlette parses the multipart body before the handler runs:
+every file of the request has already been received and spooled to a
+temporary file by then, so the handler's checks can't stop an oversized
+upload from being transferred. UploadSizeLimit (installed by the server
+in front of the app) bounds that part: a request whose Content-Length
+is over UPLOAD_MAX_REQUEST_BYTES gets 413 before its body is read, and
+one without a length (chunked) is cut off with 413 once it gets there.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import logging
 import os
+import uuid
+from typing import List, Tuple
 
-from fastapi import APIRouter, File, UploadFile
+from fastapi import APIRouter, File, HTTPException, UploadFile
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.deps import get_ingestion_queue
+from src.rag.ingestion import IngestionJob, IngestionQueueFull
 
-from src.rag.loader import DocumentLoader
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
 
 router = APIRouter()
 UPLOAD_DIR = "uploaded_docs"
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+# Hex digits of the sha256 kept in stored file names
+HASH_PREFIX = 16
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+# Whole request body (all files + multipart framing)
+UPLOAD_MAX_REQUEST_BYTES = int(
+    os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(UPLOAD_MAX_BYTES + 1024 * 1024))
+)
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds UPLOAD_MAX_BYTES."""
 
 
 # Ensure folder exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+class UploadSizeLimit:
+    """ASGI middleware capping request bodies under path_prefix.
+
+    Runs before Starlette spools the multipart body: a declared
+    Content-Length over max_bytes is answered with 413 without reading
+    the body, and an undeclared (chunked) one is counted as it arrives
+    and aborted with 413 once it passes max_bytes.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        path_prefix: str = "/upload",
+        max_bytes: int = UPLOAD_MAX_REQUEST_BYTES,
+    ) -> None:
+        self.app = app
+        self.path_prefix = path_prefix
+        self.max_bytes = max_bytes
+
+    def _too_large(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "detail": f"Upload exceeds the {self.max_bytes} byte request limit"
+            },
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await self._too_large()(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing; FastAPI passes it through
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Upload exceeds the {self.max_bytes} byte "
+                        "request limit",
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _store(file: UploadFile, filename: str) -> Tuple[str, str, bool]:
+    """Copy an upload to UPLOAD_DIR block by block, hashing as it goes.
+
+    Returns (stored path, sha256, already stored). Runs in a worker
+    thread: the reads and writes are blocking.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                block = file.file.read(UPLOAD_CHUNK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadTooLarge(
+                        f"{filename} exceeds the {UPLOAD_MAX_BYTES} byte upload limit"
+                    )
+                digest.update(block)
+                out.write(block)
+
+        sha256 = digest.hexdigest()
+        file_path = os.path.join(UPLOAD_DIR, f"{sha256[:HASH_PREFIX]}_{filename}")
+        # Same name + same bytes: already stored (ingestion skips it too)
+        duplicate = os.path.exists(file_path)
+        if duplicate:
+            # Now the current version (see _prune_superseded())
+            os.utime(file_path)
+        else:
+            os.replace(tmp_path, file_path)
+        return file_path, sha256, duplicate
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove(paths: List[str]) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _is_version_of(stored_name: str, filename: str) -> bool:
+    """Whether stored_name is <sha256 prefix>_<filename>."""
+    prefix, sep, name = stored_name.partition("_")
+    return (
+        bool(sep)
+        and name == filename
+        and len(prefix) == HASH_PREFIX
+        and all(c in "0123456789abcdef" for c in prefix)
+    )
+
+
+def _prune_superseded(job: IngestionJob) -> None:
+    """Delete stored versions older than the ones job has just indexed.
+
+    Runs after the job succeeded, so the index no longer refers to them.
+    Newer versions are kept: their own job may still be queued.
+    """
+    for path in job.paths:
+        filename = os.path.basename(job.doc_ids.get(path, path))
+        try:
+            current = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        for entry in os.scandir(UPLOAD_DIR):
+            if (
+                entry.path != path
+                and _is_version_of(entry.name, filename)
+                and entry.stat().st_mtime_ns < current
+            ):
+                LOGGER.info(f"Removing superseded upload {entry.path}")
+                os.remove(entry.path)
+
+
 @router.post("/")
 async def upload_files(files: list[UploadFile] = File(...)):
-    """Upload PDF/TXT files → save → parse → return extracted text length.
+    """Upload PDF/TXT files → save → enqueue background ingestion.
 
-    Example Response:
+    Example Response (202):
         {
-            "filename": "doc.pdf",
-            "saved_to": "uploaded_docs/doc.pdf",
-            "chunks": 12
+            "job_id": "3f2c...",
+            "status": "queued",
+            "uploads": [
+                {
+                    "filename": "doc.pdf",
+                    "sha256": "9f86d0...",
+                    "saved_to": "uploaded_docs/9f86d081884c7d65_doc.pdf",
+                    "doc_id": "uploaded_docs/doc.pdf",
+                    "duplicate": false
+                }
+            ]
         }
     """
     results = []
+    paths = []
+    digests = {}
+    doc_ids = {}
+    # Written by this request (not already stored): removed if it fails
+    created: List[str] = []
 
+    # Declared sizes are checked before anything is written
     for file in files:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
+        if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{file.filename} exceeds the {UPLOAD_MAX_BYTES} byte "
+                "upload limit",
+            )
 
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+    for file in files:
+        filename = os.path.basename(file.filename or "")
 
-        # Load & split text
-        try:
-            loader = DocumentLoader()
-            chunks = loader.load(file_path)
+        if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
             results.append(
                 {
-                    "filename": file.filename,
-                    "saved_to": file_path,
-                    "chunks": len(chunks),
+                    "filename": filename,
+                    "error": f"Unsupported file type: {filename}",
                 }
             )
-        except Exception as e:
-            results.append(
-                {
-                    "filename": file.filename,
-                    "error": str(e),
-                }
+            continue
+
+        try:
+            file_path, digest, duplicate = await asyncio.to_thread(
+                _store, file, filename
             )
+        except Exception as err:
+            await asyncio.to_thread(_remove, created)
+            if isinstance(err, UploadTooLarge):
+                raise HTTPException(status_code=413, detail=str(err))
+            raise
+        if not duplicate:
+            created.append(file_path)
+
+        paths.append(file_path)
+        digests[file_path] = digest
+        # Stable per name: re-uploading a revised file replaces the old one
+        doc_ids[file_path] = os.path.join(UPLOAD_DIR, filename)
+        results.append(
+            {
+                "filename": filename,
+                "sha256": digest,
+                "saved_to": file_path,
+                "doc_id": doc_ids[file_path],
+                "duplicate": duplicate,
+            }
+        )
+
+    if not paths:
+        return JSONResponse(status_code=400, content={"uploads": results})
+
+    try:
+        job = get_ingestion_queue().submit(
+            paths, digests, doc_ids, on_done=_prune_superseded
+        )
+    except IngestionQueueFull as err:
+        raise HTTPException(status_code=503, detail=str(err))
+
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "uploads": results},
+    )
+
 
-    return JSONResponse(content={"uploads": results})
+@router.get("/jobs/{job_id}")
+def ingestion_status(job_id: str):
+    """Poll a background ingestion job."""
+    job = get_ingestion_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
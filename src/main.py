@@ -1,10 +1,38 @@
 """Module: main
 
 High-level controller: routing, agents, context, and RAG integration.
+
+First-turn answers are cached (src.utils.response_cache) per selected
+domain, RAG corpus version and prompt template version; a hit skips the
+router and the agent and is replayed through the streaming path too.
+Identical first-turn requests that arrive while one is still being
+answered are coalesced onto it (src.utils.single_flight), tokens
+included.
+
+RAG retrieval depends only on the query, so it starts on a worker
+thread before routing and overlaps with it; the hits are handed to the
+routed agent, or discarded when that agent has no RAG. Per-stage
+latencies (route, retrieve, generate, ...) are reported by metrics().
+
+With SPECULATIVE_DOMAIN=true, a request that names its domain starts
+streaming from that domain's agent while the router runs, buffering the
+tokens. If the router overrules the selection (wrong domain, confidence
+at or above the rejection threshold), fails, or the caller goes away
+while it runs, the generation is cancelled and its tokens are counted as
+wasted; otherwise the buffered tokens are the answer.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from src.agents.base_agent import BaseAgent, Hit
 from src.agents.coding_agent import CodingAgent
 from src.agents.education_agent import EducationAgent
 from src.agents.general_agent import GeneralAgent
@@ -12,17 +40,44 @@ from src.agents.legal_agent import LegalAgent
 from src.agents.medical_agent import MedicalAgent
 from src.rag.rag_pipeline import RAGPipeline
 from src.router.domain_router import DomainRouter
-from src.utils.context_manager import ContextManager
+from src.router.route_cache import normalize_query
+from src.utils.response_cache import ResponseCache, Scope, replay_tokens
+from src.utils.session_store import SessionStore
+from src.utils.single_flight import AsyncSingleFlight, SingleFlight
+from src.utils.speculation import AsyncSpeculation, Speculation
+from src.utils.stage_timings import StageTimings
+from src.utils.tokens import count_tokens
 from dotenv import load_dotenv
 load_dotenv()
 
 
+# Memory bucket for callers that don't send a session id
+DEFAULT_SESSION = "default"
+
+# Router confidence from which a selected domain the router disagrees with
+# is rejected. LLM confidences are self-reported; the local classifier's
+# are a sharp softmax (temperature 0.05) where 0.75 only means the best
+# centroid beats the runner-up by ~0.055 cosine, so it gets a stricter
+# bar (0.9 ~ a 0.11 margin).
+REJECT_CONFIDENCE = 0.75
+LOCAL_REJECT_CONFIDENCE = float(os.getenv("ROUTER_LOCAL_REJECT_CONFIDENCE", "0.9"))
+
+# Retrieve RAG context concurrently with routing
+RAG_PREFETCH = os.getenv("RAG_PREFETCH", "true").lower() in ("1", "true", "yes")
+RAG_PREFETCH_WORKERS = int(os.getenv("RAG_PREFETCH_WORKERS", "4"))
+# Generate for the selected domain before the router has confirmed it
+SPECULATIVE_DOMAIN = os.getenv("SPECULATIVE_DOMAIN", "false").lower() in (
+    "1", "true", "yes"
+)
+
 
 class MultiDomainAssistant:
     def __init__(self) -> None:
-        self.context_manager = ContextManager()
-        self.router = DomainRouter()
+        # Per-session memory (SESSION_BACKEND=memory|sqlite)
+        self.sessions = SessionStore.from_env()
         self.rag = RAGPipeline()  # single shared RAG pipeline
+        # Router reuses the RAG embedding model for local (no-LLM) routing
+        self.router = DomainRouter(embedder=self.rag.vectorstore.model)
 
         # create agents
         self.agents = {
@@ -39,12 +94,114 @@ class MultiDomainAssistant:
             if name in rag_enabled:
                 agent.enable_rag(self.rag)
 
-    def ask(self, query: str, selected_domain: str | None = None) -> str:
-        route = self.router.route(query)
+        # Whole-answer cache (RESPONSE_CACHE_SIZE=0 disables it)
+        self.responses = ResponseCache.from_env(embedder=self.rag.vectorstore.model)
+        self.template_version = self._template_version()
+
+        # Coalesces identical in-flight first-turn requests
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+
+        # Retrieval overlapping routing (None = agents search themselves)
+        self._rag_agents = [a for a in self.agents.values() if a.rag is not None]
+        self._prefetch_pool: Optional[ThreadPoolExecutor] = None
+        if RAG_PREFETCH and self._rag_agents:
+            self._prefetch_pool = ThreadPoolExecutor(
+                max_workers=RAG_PREFETCH_WORKERS, thread_name_prefix="rag-prefetch"
+            )
+        self._prefetch_stats = {"used": 0, "discarded": 0, "failed": 0}
+        self._speculation_stats = {"hits": 0, "cancelled": 0, "cancelled_tokens": 0}
+        self._stats_lock = threading.Lock()
+        self.timings = StageTimings()
+
+    def _template_version(self) -> str:
+        """Fingerprint of everything besides the query that shapes an answer:
+        prompt templates, models and the router prompt.
+        """
+        h = hashlib.sha256(self.router._prompt("").encode("utf-8"))
+        for name, agent in sorted(self.agents.items()):
+            h.update(name.encode("utf-8"))
+            h.update(agent.llm.model.encode("utf-8"))
+            h.update(agent.prompt_template.build_prompt("", {}).encode("utf-8"))
+        return h.hexdigest()[:12]
+
+    # ---------------------------------------------------------
+    # Response cache / coalescing
+    # ---------------------------------------------------------
+    def _scope(self, selected_domain: str | None, context: Dict) -> Optional[Scope]:
+        """Answers are shareable between requests with the same scope and
+        normalized query. None when the answer depends on the conversation.
+        """
+        if context.get("memory"):
+            if self.responses is not None:
+                self.responses.bypass()
+            return None
+
+        self.rag.refresh()
+        return (
+            (selected_domain or "").strip().lower(),
+            self.rag.corpus_version,
+            self.template_version,
+        )
+
+    def _lookup(
+        self, query: str, selected_domain: str | None, context: Dict
+    ) -> Tuple[Optional[Scope], Optional[Dict]]:
+        """(scope, cached answer or None)."""
+        scope = self._scope(selected_domain, context)
+        if scope is None or self.responses is None:
+            return scope, None
+        return scope, self.responses.get(scope, query)
+
+    def _store(self, scope: Optional[Scope], query: str, answer: Dict) -> None:
+        if scope is not None and self.responses is not None:
+            self.responses.put(scope, query, answer)
+
+    @staticmethod
+    def _answer(decision: Dict, output: str) -> Dict:
+        return {
+            "domain": decision["domain"],
+            "confidence": decision["confidence"],
+            "output": output,
+            "rejection": decision["rejection"] is not None,
+        }
+
+    @staticmethod
+    def _render(answer: Dict) -> str:
+        """ask()'s reply text for a decision/cached answer."""
+        if answer["rejection"]:
+            return f"[domain=system confidence=1.0]\n{answer['output']}"
+        return (
+            f"[domain={answer['domain']} confidence={answer['confidence']:.2f}]\n"
+            f"{answer['output']}"
+        )
+
+    @staticmethod
+    def _replay(answer: Dict) -> Iterator[Dict]:
+        """ask_stream() events for a cached answer."""
+        yield {
+            "type": "meta",
+            "domain": answer["domain"],
+            "confidence": answer["confidence"],
+        }
+        for token in replay_tokens(answer["output"]):
+            yield {"type": "token", "content": token}
+
+    def _decide(self, route: Dict, selected_domain: str | None) -> Dict:
+        """Combine the router's decision with the user's selected domain.
 
+        Returns a dict with ``domain``, ``confidence`` and ``rejection``; the
+        latter holds the "wrong domain" message when the router overrules the
+        user's selection, otherwise ``None``.
+        """
         predicted_domain = route["domain"]
         confidence = route["confidence"]
         reason = route["reason"]
+        threshold = (
+            LOCAL_REJECT_CONFIDENCE
+            if route.get("source") == "local"
+            else REJECT_CONFIDENCE
+        )
 
         # 1. NORMALIZE STRINGS (Crucial Fix)
         # Convert to lowercase and strip spaces to ensure accurate comparison
@@ -58,25 +215,28 @@ class MultiDomainAssistant:
         final_domain = predicted_domain # Default fallback
 
         # ✅ CASE 1: User selected a domain AND router is confident
-        if sel_clean and confidence >= 0.75:
+        if sel_clean and confidence >= threshold:
             # Check if domains match using the CLEAN versions
             if pred_clean != sel_clean:
                 # OPTIONAL: Allow "General" chit-chat in any domain?
                 # If prompt is "hello" (General) but user is in "Medical", maybe don't force switch?
                 # if pred_clean == "general": pass (Uncomment to allow this)
-                
-                return (
-                    f"[domain=system confidence=1.0]\n"
-                    f"❌ Wrong domain selected.\n\n"
-                    f"✅ Please switch to **{predicted_domain.upper()}** for this question.\n\n"
-                    f"Reason: {reason}"
-                )
+
+                return {
+                    "domain": "system",
+                    "confidence": 1.0,
+                    "rejection": (
+                        f"❌ Wrong domain selected.\n\n"
+                        f"✅ Please switch to **{predicted_domain.upper()}** for this question.\n\n"
+                        f"Reason: {reason}"
+                    ),
+                }
 
             # ✅ If router agrees → proceed normally
             final_domain = selected_domain
 
         # ✅ CASE 2: User selected a domain BUT router is UNCERTAIN
-        elif sel_clean and confidence < 0.75:
+        elif sel_clean and confidence < threshold:
             # Trust user input if the router isn't sure
             final_domain = selected_domain
 
@@ -84,17 +244,485 @@ class MultiDomainAssistant:
         else:
             final_domain = predicted_domain
 
-        # 2. RUN AGENT
+        return {"domain": final_domain, "confidence": confidence, "rejection": None}
+
+    def _agent_for(self, domain: str):
         # Ensure your agents dictionary keys match the normalized or raw format you prefer
         # If keys are lowercase (e.g., 'medical'), use final_domain.lower()
-        agent = self.agents.get(final_domain.lower(), self.agents["general"])
+        return self.agents.get(domain.lower(), self.agents["general"])
 
-        context = self.context_manager.build_context()
-        output = agent.run(query, context)
+    # ---------------------------------------------------------
+    # Retrieval prefetch (runs while the router decides)
+    # ---------------------------------------------------------
+    def _retrieve(self, query: str) -> List[Hit]:
+        # Sized for the largest RAG prompt; each agent trims to its own
+        budget = max(agent.retrieval_budget() for agent in self._rag_agents)
+        with self.timings.measure("retrieve"):
+            return self.rag.search(query, max_tokens=budget)
 
-        self.context_manager.add_memory(query, output)
+    def _prefetch(self, query: str) -> Optional[Future]:
+        if self._prefetch_pool is None:
+            return None
+        return self._prefetch_pool.submit(self._retrieve, query)
 
-        return (
-            f"[domain={final_domain} confidence={confidence:.2f}]\n"
-            f"{output}"
-        )
\ No newline at end of file
+    def _aprefetch(self, query: str) -> Optional[asyncio.Future]:
+        if self._prefetch_pool is None:
+            return None
+        future = asyncio.get_running_loop().run_in_executor(
+            self._prefetch_pool, self._retrieve, query
+        )
+        # A discarded prefetch may fail without anyone awaiting it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    def _count_prefetch(self, outcome: str) -> None:
+        with self._stats_lock:
+            self._prefetch_stats[outcome] += 1
+
+    def _discard(self, prefetch: Optional[Future | asyncio.Future]) -> None:
+        if prefetch is not None:
+            prefetch.cancel()
+            self._count_prefetch("discarded")
+
+    def _prefetched(
+        self, agent: BaseAgent, prefetch: Optional[Future]
+    ) -> Optional[List[Hit]]:
+        """Prefetched hits for agent; None lets the agent search itself."""
+        if prefetch is None or agent.rag is None:
+            self._discard(prefetch)
+            return None
+        try:
+            with self.timings.measure("retrieve_wait"):
+                hits = prefetch.result()
+        except Exception:
+            # The agent retries and reports the failure in its prompt
+            self._count_prefetch("failed")
+            return None
+        self._count_prefetch("used")
+        return hits
+
+    async def _aprefetched(
+        self, agent: BaseAgent, prefetch: Optional[asyncio.Future]
+    ) -> Optional[List[Hit]]:
+        """Async _prefetched()."""
+        if prefetch is None or agent.rag is None:
+            self._discard(prefetch)
+            return None
+        try:
+            with self.timings.measure("retrieve_wait"):
+                hits = await prefetch
+        except Exception:
+            self._count_prefetch("failed")
+            return None
+        self._count_prefetch("used")
+        return hits
+
+    # ---------------------------------------------------------
+    # Speculative generation for the selected domain
+    # ---------------------------------------------------------
+    def _speculate(
+        self, query: str, selected_domain: str | None, context: Dict
+    ) -> Optional[Speculation]:
+        if not SPECULATIVE_DOMAIN or not (selected_domain or "").strip():
+            return None
+        agent = self._agent_for(selected_domain.strip())
+        return Speculation(lambda: agent.stream(query, context))
+
+    def _aspeculate(
+        self, query: str, selected_domain: str | None, context: Dict
+    ) -> Optional[AsyncSpeculation]:
+        if not SPECULATIVE_DOMAIN or not (selected_domain or "").strip():
+            return None
+        agent = self._agent_for(selected_domain.strip())
+        return AsyncSpeculation(lambda: agent.astream(query, context))
+
+    def _settle(
+        self,
+        speculation: Optional[Speculation | AsyncSpeculation],
+        decision: Dict,
+    ) -> Optional[Speculation | AsyncSpeculation]:
+        """Keep the speculation if the router accepted the selected domain.
+
+        With a selected domain the decision is either that domain or a
+        rejection, so anything but a rejection is a hit.
+        """
+        if speculation is None:
+            return None
+        if decision["rejection"] is None:
+            with self._stats_lock:
+                self._speculation_stats["hits"] += 1
+            return speculation
+        self._abandon(speculation)
+        return None
+
+    def _abandon(self, speculation: Optional[Speculation | AsyncSpeculation]) -> None:
+        """Cancel a speculation nobody will read, counting its tokens as wasted."""
+        if speculation is None:
+            return
+        wasted = count_tokens(speculation.cancel())
+        with self._stats_lock:
+            self._speculation_stats["cancelled"] += 1
+            self._speculation_stats["cancelled_tokens"] += wasted
+
+    def _speculation_metrics(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._speculation_stats)
+        settled = stats["hits"] + stats["cancelled"]
+        stats["enabled"] = SPECULATIVE_DOMAIN
+        stats["hit_rate"] = round(stats["hits"] / settled, 4) if settled else 0.0
+        return stats
+
+    # ---------------------------------------------------------
+    # Generation (one per scope + query when coalesced)
+    # ---------------------------------------------------------
+    def _generate(
+        self,
+        query: str,
+        selected_domain: str | None,
+        context: Dict,
+        scope: Optional[Scope],
+    ) -> Dict:
+        start = time.perf_counter()
+        speculation = self._speculate(query, selected_domain, context)
+        prefetch = None if speculation else self._prefetch(query)
+        try:
+            with self.timings.measure("route"):
+                decision = self._decide(self.router.route(query), selected_domain)
+        except BaseException:
+            # Routing failed or the caller went away: stop the head start
+            self._abandon(speculation)
+            self._discard(prefetch)
+            raise
+        speculation = self._settle(speculation, decision)
+
+        if decision["rejection"] is not None:
+            self._discard(prefetch)
+            answer = self._answer(decision, decision["rejection"])
+        elif speculation is not None:
+            with self.timings.measure("generate"):
+                output = "".join(speculation.tokens()).strip()
+            answer = self._answer(decision, output)
+        else:
+            # 2. RUN AGENT
+            agent = self._agent_for(decision["domain"])
+            hits = self._prefetched(agent, prefetch)
+            with self.timings.measure("generate"):
+                output = agent.run(query, context, hits)
+            answer = self._answer(decision, output)
+        self.timings.record("total", time.perf_counter() - start)
+
+        self._store(scope, query, answer)
+        return answer
+
+    def _generate_stream(
+        self,
+        query: str,
+        selected_domain: str | None,
+        context: Dict,
+        scope: Optional[Scope],
+    ) -> Iterator[Dict]:
+        start = time.perf_counter()
+        speculation = self._speculate(query, selected_domain, context)
+        prefetch = None if speculation else self._prefetch(query)
+        try:
+            with self.timings.measure("route"):
+                decision = self._decide(self.router.route(query), selected_domain)
+        except BaseException:
+            # Routing failed or the caller went away: stop the head start
+            self._abandon(speculation)
+            self._discard(prefetch)
+            raise
+        speculation = self._settle(speculation, decision)
+
+        yield {
+            "type": "meta",
+            "domain": decision["domain"],
+            "confidence": decision["confidence"],
+        }
+
+        if decision["rejection"] is not None:
+            self._discard(prefetch)
+            yield {"type": "token", "content": decision["rejection"]}
+            self._store(scope, query, self._answer(decision, decision["rejection"]))
+            return
+
+        if speculation is not None:
+            tokens = speculation.tokens()
+        else:
+            agent = self._agent_for(decision["domain"])
+            tokens = agent.stream(query, context, self._prefetched(agent, prefetch))
+
+        generate_start = time.perf_counter()
+        parts: List[str] = []
+        for token in tokens:
+            if not parts:
+                self.timings.record("first_token", time.perf_counter() - start)
+            parts.append(token)
+            yield {"type": "token", "content": token}
+        self.timings.record("generate", time.perf_counter() - generate_start)
+        self.timings.record("total", time.perf_counter() - start)
+
+        self._store(scope, query, self._answer(decision, "".join(parts).strip()))
+
+    async def _agenerate(
+        self,
+        query: str,
+        selected_domain: str | None,
+        context: Dict,
+        scope: Optional[Scope],
+    ) -> Dict:
+        start = time.perf_counter()
+        speculation = self._aspeculate(query, selected_domain, context)
+        prefetch = None if speculation else self._aprefetch(query)
+        try:
+            with self.timings.measure("route"):
+                route = await self.router.aroute(query)
+                decision = self._decide(route, selected_domain)
+        except BaseException:
+            # Routing failed or the caller went away: stop the head start
+            self._abandon(speculation)
+            self._discard(prefetch)
+            raise
+        speculation = self._settle(speculation, decision)
+
+        if decision["rejection"] is not None:
+            self._discard(prefetch)
+            answer = self._answer(decision, decision["rejection"])
+        elif speculation is not None:
+            with self.timings.measure("generate"):
+                output = "".join([t async for t in speculation.tokens()]).strip()
+            answer = self._answer(decision, output)
+        else:
+            agent = self._agent_for(decision["domain"])
+            hits = await self._aprefetched(agent, prefetch)
+            with self.timings.measure("generate"):
+                output = await agent.arun(query, context, hits)
+            answer = self._answer(decision, output)
+        self.timings.record("total", time.perf_counter() - start)
+
+        await asyncio.to_thread(self._store, scope, query, answer)
+        return answer
+
+    async def _agenerate_stream(
+        self,
+        query: str,
+        selected_domain: str | None,
+        context: Dict,
+        scope: Optional[Scope],
+    ) -> AsyncIterator[Dict]:
+        start = time.perf_counter()
+        speculation = self._aspeculate(query, selected_domain, context)
+        prefetch = None if speculation else self._aprefetch(query)
+        try:
+            with self.timings.measure("route"):
+                route = await self.router.aroute(query)
+                decision = self._decide(route, selected_domain)
+        except BaseException:
+            # Routing failed or the caller went away: stop the head start
+            self._abandon(speculation)
+            self._discard(prefetch)
+            raise
+        speculation = self._settle(speculation, decision)
+
+        yield {
+            "type": "meta",
+            "domain": decision["domain"],
+            "confidence": decision["confidence"],
+        }
+
+        if decision["rejection"] is not None:
+            self._discard(prefetch)
+            yield {"type": "token", "content": decision["rejection"]}
+            answer = self._answer(decision, decision["rejection"])
+            await asyncio.to_thread(self._store, scope, query, answer)
+            return
+
+        if speculation is not None:
+            tokens = speculation.tokens()
+        else:
+            agent = self._agent_for(decision["domain"])
+            hits = await self._aprefetched(agent, prefetch)
+            tokens = agent.astream(query, context, hits)
+
+        generate_start = time.perf_counter()
+        parts: List[str] = []
+        async for token in tokens:
+            if not parts:
+                self.timings.record("first_token", time.perf_counter() - start)
+            parts.append(token)
+            yield {"type": "token", "content": token}
+        self.timings.record("generate", time.perf_counter() - generate_start)
+        self.timings.record("total", time.perf_counter() - start)
+
+        answer = self._answer(decision, "".join(parts).strip())
+        await asyncio.to_thread(self._store, scope, query, answer)
+
+    @staticmethod
+    def _collect(event: Dict, meta: Dict, parts: List[str]) -> None:
+        """Track a stream's meta event and tokens (for session memory)."""
+        if event["type"] == "meta":
+            meta.update(event)
+        elif event["type"] == "token":
+            parts.append(event["content"])
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def ask(
+        self,
+        query: str,
+        selected_domain: str | None = None,
+        session_id: str = DEFAULT_SESSION,
+    ) -> str:
+        context = self.sessions.build_context(session_id)
+        scope, answer = self._lookup(query, selected_domain, context)
+
+        if answer is None:
+            args = (query, selected_domain, context, scope)
+            if scope is None:
+                answer = self._generate(*args)
+            else:
+                key = (scope, normalize_query(query))
+                answer = self.flights.do(key, lambda: self._generate(*args))
+
+        if not answer["rejection"]:
+            self.sessions.add_memory(session_id, query, answer["output"])
+
+        return self._render(answer)
+
+    def ask_stream(
+        self,
+        query: str,
+        selected_domain: str | None = None,
+        session_id: str = DEFAULT_SESSION,
+    ) -> Iterator[Dict]:
+        """Streaming counterpart of ask().
+
+        Yields a ``{"type": "meta", "domain", "confidence"}`` event first,
+        followed by ``{"type": "token", "content"}`` events as the agent's LLM
+        produces them. The full output is written to memory once the stream
+        has been consumed to the end. Cached answers are replayed as the
+        same events; identical concurrent requests share one stream.
+        """
+        context = self.sessions.build_context(session_id)
+        scope, cached = self._lookup(query, selected_domain, context)
+
+        args = (query, selected_domain, context, scope)
+        if cached is not None:
+            events = self._replay(cached)
+        elif scope is None:
+            events = self._generate_stream(*args)
+        else:
+            key = (scope, normalize_query(query))
+            events = self.flights.stream(key, lambda: self._generate_stream(*args))
+
+        meta: Dict = {}
+        parts: List[str] = []
+        for event in events:
+            self._collect(event, meta, parts)
+            yield event
+
+        if meta.get("domain") != "system":
+            self.sessions.add_memory(session_id, query, "".join(parts).strip())
+
+    async def aask(
+        self,
+        query: str,
+        selected_domain: str | None = None,
+        session_id: str = DEFAULT_SESSION,
+    ) -> str:
+        """Async ask(): provider calls are awaited instead of blocking."""
+        context = await asyncio.to_thread(self.sessions.build_context, session_id)
+        scope, answer = await asyncio.to_thread(
+            self._lookup, query, selected_domain, context
+        )
+
+        if answer is None:
+            args = (query, selected_domain, context, scope)
+            if scope is None:
+                answer = await self._agenerate(*args)
+            else:
+                key = (scope, normalize_query(query))
+                answer = await self.async_flights.do(
+                    key, lambda: self._agenerate(*args)
+                )
+
+        if not answer["rejection"]:
+            await asyncio.to_thread(
+                self.sessions.add_memory, session_id, query, answer["output"]
+            )
+
+        return self._render(answer)
+
+    async def aask_stream(
+        self,
+        query: str,
+        selected_domain: str | None = None,
+        session_id: str = DEFAULT_SESSION,
+    ) -> AsyncIterator[Dict]:
+        """Async ask_stream(): same events, without blocking the event loop."""
+        context = await asyncio.to_thread(self.sessions.build_context, session_id)
+        scope, cached = await asyncio.to_thread(
+            self._lookup, query, selected_domain, context
+        )
+
+        meta: Dict = {}
+        parts: List[str] = []
+        if cached is not None:
+            for event in self._replay(cached):
+                self._collect(event, meta, parts)
+                yield event
+        else:
+            args = (query, selected_domain, context, scope)
+            if scope is None:
+                events = self._agenerate_stream(*args)
+            else:
+                key = (scope, normalize_query(query))
+                events = self.async_flights.stream(
+                    key, lambda: self._agenerate_stream(*args)
+                )
+            async for event in events:
+                self._collect(event, meta, parts)
+                yield event
+
+        if meta.get("domain") != "system":
+            await asyncio.to_thread(
+                self.sessions.add_memory, session_id, query, "".join(parts).strip()
+            )
+
+    def warm_up(self) -> None:
+        """Load the embedding model (and local-router centroids) before use.
+
+        Everything here also loads lazily on first use; calling it from a
+        background task just moves that cost off the first request.
+        """
+        self.rag.vectorstore.model.load()
+        if self.router.mode == "local" and self.router.classifier is not None:
+            self.router.classifier._fit()
+
+    def metrics(self) -> Dict:
+        """Runtime counters for the /metrics endpoint."""
+        return {
+            "router": self.router.metrics(),
+            "sessions": self.sessions.metrics(),
+            "embeddings": self.rag.vectorstore.embedder.metrics(),
+            "retrieval": self.rag.vectorstore.queries.metrics(),
+            "dedup": self.rag.dedup.metrics() if self.rag.dedup else None,
+            "responses": self.responses.metrics() if self.responses else None,
+            "coalescing": {
+                "sync": self.flights.metrics(),
+                "async": self.async_flights.metrics(),
+            },
+            # Latency per stage; prefetch = retrieval run alongside routing
+            "pipeline": {
+                "stages": self.timings.metrics(),
+                "prefetch": dict(self._prefetch_stats),
+            },
+            # Selected-domain generation started before routing
+            "speculation": self._speculation_metrics(),
+            # Provider-reported tokens; cached_tokens = prompt-prefix cache hits
+            "llm": {
+                "router": self.router.llm.usage(),
+                **{name: agent.llm.usage() for name, agent in self.agents.items()},
+            },
+        }
@@ -0,0 +1,167 @@
+"""
+Module: client_pool
+
+Process-wide registry of provider SDK clients.
+
+Every LLM() instance (one per agent + the router) used to build its own
+Groq/OpenAI client, each with a private HTTP connection pool. Clients are
+now created once per (provider, api key) and shared, on top of httpx
+pools with keep-alive, connection limits and HTTP/2 when `h2` is
+installed. Only the selected provider's SDK is ever imported.
+
+Tuning (env):
+- LLM_MAX_CONNECTIONS            max open sockets per pool (default 100)
+- LLM_MAX_KEEPALIVE_CONNECTIONS  idle sockets kept warm (default 20)
+- LLM_KEEPALIVE_EXPIRY           seconds an idle socket is kept (default 60)
+- LLM_HTTP2                      "true"/"false" (default true)
+- LLM_TIMEOUT                    request timeout in seconds (default 60)
+- LLM_WARMUP                     warm pools at startup (default true)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
+
+
+class ProviderClients:
+    """Sync + async SDK clients for one provider, sharing pool settings."""
+
+    def __init__(self, provider: str, client, async_client) -> None:
+        self.provider = provider
+        self.client = client
+        self.async_client = async_client
+
+
+_REGISTRY: Dict[Tuple[str, str], ProviderClients] = {}
+_LOCK = threading.Lock()
+
+
+def resolve_provider() -> Tuple[str, str]:
+    """Pick the provider from the environment (Groq wins over OpenAI)."""
+    groq_key = os.getenv("GROQ_API_KEY")
+    openai_key = os.getenv("OPENAI_API_KEY")
+
+    if groq_key:
+        return "groq", groq_key
+    if openai_key:
+        return "openai", openai_key
+
+    raise ValueError("No API key found. Set either GROQ_API_KEY or OPENAI_API_KEY.")
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])."""
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _build(provider: str, api_key: str) -> ProviderClients:
+    http2 = _http2_enabled()
+    http_client = httpx.Client(
+        http2=http2, limits=_limits(), timeout=LLM_TIMEOUT
+    )
+    async_http_client = httpx.AsyncClient(
+        http2=http2, limits=_limits(), timeout=LLM_TIMEOUT
+    )
+
+    # Import only the SDK in use (each costs a few hundred ms at boot)
+    if provider == "groq":
+        import groq
+
+        client = groq.Groq(api_key=api_key, http_client=http_client)
+        async_client = groq.AsyncGroq(api_key=api_key, http_client=async_http_client)
+    else:
+        from openai import AsyncOpenAI, OpenAI
+
+        client = OpenAI(api_key=api_key, http_client=http_client)
+        async_client = AsyncOpenAI(api_key=api_key, http_client=async_http_client)
+
+    LOGGER.info(
+        f"Created shared {provider} client pool "
+        f"(http2={http2}, max_connections={LLM_MAX_CONNECTIONS})"
+    )
+    return ProviderClients(provider, client, async_client)
+
+
+def get_clients(
+    provider: Optional[str] = None, api_key: Optional[str] = None
+) -> ProviderClients:
+    """Return the shared clients for a provider, creating them on first use."""
+    if provider is None or api_key is None:
+        provider, api_key = resolve_provider()
+
+    key = (provider, api_key)
+    clients = _REGISTRY.get(key)
+    if clients is not None:
+        return clients
+
+    with _LOCK:
+        clients = _REGISTRY.get(key)
+        if clients is None:
+            clients = _build(provider, api_key)
+            _REGISTRY[key] = clients
+        return clients
+
+
+async def awarm_up() -> None:
+    """Open pooled connections (DNS + TCP + TLS) before the first user request.
+
+    Issues a cheap `models.list()` on both the async and sync client. Failures
+    are logged only — a cold pool is slower, not broken.
+    """
+    try:
+        clients = get_clients()
+    except ValueError as err:
+        LOGGER.warning(f"LLM warm-up skipped: {err}")
+        return
+
+    try:
+        await clients.async_client.models.list()
+        await asyncio.to_thread(clients.client.models.list)
+        LOGGER.info(f"Warmed up {clients.provider} connection pool")
+    except Exception as err:
+        LOGGER.warning(f"LLM warm-up failed: {err}")
+
+
+async def aclose_all() -> None:
+    """Close every pooled connection (call on shutdown)."""
+    with _LOCK:
+        registered = list(_REGISTRY.values())
+        _REGISTRY.clear()
+
+    for clients in registered:
+        try:
+            clients.client.close()
+            await clients.async_client.close()
+        except Exception as err:
+            LOGGER.warning(f"Closing {clients.provider} client failed: {err}")
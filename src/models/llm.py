@@ -6,24 +6,41 @@ Unified wrapper supporting BOTH:
 - OpenAI GPT (GPT-4o / GPT-3.5)
 
 Auto-selects provider based on available API key.
+
+generate()/stream() take either a prompt string (sent as one user
+message) or a chat message list. Agents send a static system message
+first so the provider can reuse its cached prompt prefix; the prompt,
+cached and completion token counts each provider reports are summed in
+usage() for /metrics.
 """
 
 from __future__ import annotations
 import os
 import logging
-from typing import Optional, Generator
+import threading
+from typing import AsyncGenerator, Dict, Generator, List, Optional, Union
 from dotenv import load_dotenv
 load_dotenv()
 
 
-# Providers
-from openai import OpenAI
-import groq
+from src.models.client_pool import get_clients, resolve_provider
 
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
+# A prompt string or chat messages ({"role", "content"} dicts)
+Prompt = Union[str, List[Dict[str, str]]]
+
+
+def _field(obj, name: str):
+    """Attribute or dict key (SDK objects vs raw dicts), else None."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
 
 class LLM:
     """LLM wrapper that automatically picks Groq or OpenAI."""
@@ -38,37 +55,83 @@ class LLM:
         self.temperature = temperature
         self.max_tokens = max_tokens
 
-        # Provider Selection Logic
-        groq_key = os.getenv("GROQ_API_KEY")
-        openai_key = os.getenv("OPENAI_API_KEY")
+        # Provider Selection Logic — SDK clients come from the shared pool,
+        # so every agent and the router reuse the same connections.
+        provider, api_key = resolve_provider()
+        clients = get_clients(provider, api_key)
+
+        self.provider = provider
+        self.client = clients.client
+        self.async_client = clients.async_client
 
-        if groq_key:
+        if provider == "groq":
             # ------ GROQ MODE ------
-            self.provider = "groq"
-            self.client = groq.Groq(api_key=groq_key)
             self.model = model or os.getenv(
                 "GROQ_MODEL",
                 "llama-3.1-8b-instant"         # recommended fast model
             )
             LOGGER.info(f"Using GROQ LLM: {self.model}")
 
-        elif openai_key:
+        else:
             # ------ OPENAI MODE ------
-            self.provider = "openai"
-            self.client = OpenAI(api_key=openai_key)
             self.model = model or os.getenv(
                 "OPENAI_MODEL",
                 "gpt-4o"                       # default OpenAI model
             )
             LOGGER.info(f"Using OpenAI LLM: {self.model}")
 
-        else:
-            raise ValueError(
-                "No API key found. Set either GROQ_API_KEY or OPENAI_API_KEY."
-            )
+        self._usage = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+        }
+        self._usage_lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Messages / usage
+    # ---------------------------------------------------------
+    @staticmethod
+    def _messages(prompt: Prompt) -> List[Dict[str, str]]:
+        if isinstance(prompt, str):
+            return [{"role": "user", "content": prompt}]
+        return prompt
+
+    def _stream_kwargs(self) -> Dict:
+        # OpenAI only reports usage on streams when asked; Groq always
+        # attaches it to the last chunk (x_groq.usage)
+        if self.provider == "groq":
+            return {}
+        return {"stream_options": {"include_usage": True}}
+
+    def _record_usage(self, usage) -> None:
+        """Add a provider usage report to the running totals."""
+        if usage is None:
+            return
+        cached = _field(_field(usage, "prompt_tokens_details"), "cached_tokens")
+        with self._usage_lock:
+            self._usage["calls"] += 1
+            self._usage["prompt_tokens"] += _field(usage, "prompt_tokens") or 0
+            self._usage["cached_tokens"] += cached or 0
+            self._usage["completion_tokens"] += _field(usage, "completion_tokens") or 0
+
+    def _record_chunk_usage(self, chunk) -> None:
+        usage = _field(chunk, "usage") or _field(_field(chunk, "x_groq"), "usage")
+        self._record_usage(usage)
+
+    def usage(self) -> Dict:
+        """Token totals reported by the provider (cached = prefix-cache hits)."""
+        with self._usage_lock:
+            usage = dict(self._usage)
+        usage["cached_ratio"] = (
+            round(usage["cached_tokens"] / usage["prompt_tokens"], 4)
+            if usage["prompt_tokens"]
+            else 0.0
+        )
+        return usage
 
     # GENERATE
-    def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+    def generate(self, prompt: Prompt, max_tokens: Optional[int] = None) -> str:
         """Generate a full response from Groq or OpenAI."""
         print("====== PROMPT SENT TO LLM ======")
         print(prompt)
@@ -81,10 +144,11 @@ class LLM:
             if self.provider == "groq":
                 response = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=self._messages(prompt),
                     temperature=self.temperature,
                     max_tokens=tokens,
                 )
+                self._record_usage(response.usage)
                 msg = response.choices[0].message.content
                 return msg.strip()
 
@@ -92,10 +156,11 @@ class LLM:
             else:
                 response = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=self._messages(prompt),
                     temperature=self.temperature,
                     max_tokens=tokens,
                 )
+                self._record_usage(response.usage)
                 msg = response.choices[0].message.content
                 return msg.strip()
 
@@ -104,39 +169,112 @@ class LLM:
             return "ERROR: LLM generate() failed"
 
     # STREAM
-    def stream(self, prompt: str) -> Generator[str, None, None]:
-        """Streaming response from either provider."""
+    def stream(
+        self, prompt: Prompt, max_tokens: Optional[int] = None
+    ) -> Generator[str, None, None]:
+        """Streaming response from either provider, yielding content deltas."""
+        tokens = max_tokens or self.max_tokens
+
         try:
             # ------------------ GROQ ------------------
             if self.provider == "groq":
                 stream = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=self._messages(prompt),
                     temperature=self.temperature,
-                    max_tokens=self.max_tokens,
+                    max_tokens=tokens,
                     stream=True,
+                    **self._stream_kwargs(),
                 )
-                for chunk in stream:
-                    delta = chunk.choices[0].delta
-                    token = delta.get("content", "")
-                    if token:
-                        yield token
+                try:
+                    for chunk in stream:
+                        self._record_chunk_usage(chunk)
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if token:
+                            yield token
+                finally:
+                    # Consumer stopped early (e.g. cancelled): end the request
+                    stream.close()
 
             # ------------------ OPENAI ------------------
             else:
                 stream = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=self._messages(prompt),
                     temperature=self.temperature,
-                    max_tokens=self.max_tokens,
+                    max_tokens=tokens,
                     stream=True,
+                    **self._stream_kwargs(),
                 )
-                for chunk in stream:
-                    delta = chunk.choices[0].delta
-                    token = delta.get("content", "")
+                try:
+                    for chunk in stream:
+                        self._record_chunk_usage(chunk)
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if token:
+                            yield token
+                finally:
+                    # Consumer stopped early (e.g. cancelled): end the request
+                    stream.close()
+
+        except Exception as err:
+            LOGGER.error(f"LLM.stream() failed: {err}")
+            yield "[STREAM ERROR]"
+
+    # ASYNC GENERATE
+    async def agenerate(
+        self, prompt: Prompt, max_tokens: Optional[int] = None
+    ) -> str:
+        """Async generate() — awaits the provider without blocking the event loop."""
+        tokens = max_tokens or self.max_tokens
+
+        try:
+            # Groq and OpenAI async clients share the same chat.completions API
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                temperature=self.temperature,
+                max_tokens=tokens,
+            )
+            self._record_usage(response.usage)
+            msg = response.choices[0].message.content
+            return msg.strip()
+
+        except Exception as err:
+            LOGGER.error(f"LLM.agenerate() failed: {err}")
+            return "ERROR: LLM generate() failed"
+
+    # ASYNC STREAM
+    async def astream(
+        self, prompt: Prompt, max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[str, None]:
+        """Async stream() — yields content deltas as they arrive."""
+        tokens = max_tokens or self.max_tokens
+
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                temperature=self.temperature,
+                max_tokens=tokens,
+                stream=True,
+                **self._stream_kwargs(),
+            )
+            try:
+                async for chunk in stream:
+                    self._record_chunk_usage(chunk)
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
                     if token:
                         yield token
+            finally:
+                # Consumer stopped early (e.g. cancelled): end the request
+                await stream.close()
 
         except Exception as err:
-            LOGGER.error(f"LLM.stream() failed: {err}")
+            LOGGER.error(f"LLM.astream() failed: {err}")
             yield "[STREAM ERROR]"
@@ -0,0 +1,128 @@
+"""Module: chunk_store
+
+Compact on-disk storage for chunk text + metadata next to a FAISS index.
+
+Layout (inside one index directory):
+- chunks.bin  concatenated UTF-8 chunk texts
+- meta.bin    concatenated compact-JSON metadata blobs
+- chunks.idx  numpy structured array, one row per chunk sorted by FAISS id:
+              (id, text_off, text_len, meta_off, meta_len)
+
+Readers mmap all three files, so several worker processes share the same
+page-cache pages and nothing is parsed up front: a lookup is a binary
+search on the id column plus one slice.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+TEXT_FILE = "chunks.bin"
+META_FILE = "meta.bin"
+INDEX_FILE = "chunks.idx"
+
+ROW_DTYPE = np.dtype(
+    [
+        ("id", "<i8"),
+        ("text_off", "<i8"),
+        ("text_len", "<i8"),
+        ("meta_off", "<i8"),
+        ("meta_len", "<i8"),
+    ]
+)
+
+
+def _mmap_file(path: str):
+    """Read-only mmap of path (empty files can't be mapped: use bytes)."""
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_chunk_files(
+    directory: str, rows: Iterable[Tuple[int, str, Dict]]
+) -> int:
+    """Write (id, text, metadata) rows, which must come in ascending id order.
+
+    Files are written under temporary names and swapped in with
+    os.replace(), so concurrent readers keep their old mapping intact.
+    Returns the number of rows written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    text_path = os.path.join(directory, TEXT_FILE)
+    meta_path = os.path.join(directory, META_FILE)
+    index_path = os.path.join(directory, INDEX_FILE)
+
+    records = []
+    text_off = meta_off = 0
+
+    with open(text_path + ".tmp", "wb") as text_f, open(meta_path + ".tmp", "wb") as meta_f:
+        for faiss_id, text, meta in rows:
+            text_bytes = text.encode("utf-8")
+            meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+
+            text_f.write(text_bytes)
+            meta_f.write(meta_bytes)
+            records.append(
+                (faiss_id, text_off, len(text_bytes), meta_off, len(meta_bytes))
+            )
+
+            text_off += len(text_bytes)
+            meta_off += len(meta_bytes)
+
+    with open(index_path + ".tmp", "wb") as idx_f:
+        np.save(idx_f, np.array(records, dtype=ROW_DTYPE))
+
+    for path in (text_path, meta_path, index_path):
+        os.replace(path + ".tmp", path)
+
+    return len(records)
+
+
+class MappedChunks:
+    """Read-only, memory-mapped view of files written by write_chunk_files()."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.rows = np.load(os.path.join(directory, INDEX_FILE), mmap_mode="r")
+        self.ids = self.rows["id"]
+        self._text = _mmap_file(os.path.join(directory, TEXT_FILE))
+        self._meta = _mmap_file(os.path.join(directory, META_FILE))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _row(self, faiss_id: int) -> Optional[int]:
+        pos = int(np.searchsorted(self.ids, faiss_id))
+        if pos < len(self.ids) and self.ids[pos] == faiss_id:
+            return pos
+        return None
+
+    def __contains__(self, faiss_id: int) -> bool:
+        return self._row(faiss_id) is not None
+
+    def text(self, faiss_id: int) -> Optional[str]:
+        pos = self._row(faiss_id)
+        if pos is None:
+            return None
+        row = self.rows[pos]
+        start = int(row["text_off"])
+        return self._text[start : start + int(row["text_len"])].decode("utf-8")
+
+    def meta(self, faiss_id: int) -> Optional[Dict]:
+        pos = self._row(faiss_id)
+        if pos is None:
+            return None
+        row = self.rows[pos]
+        start = int(row["meta_off"])
+        return json.loads(self._meta[start : start + int(row["meta_len"])])
+
+    def iter_ids(self) -> Iterator[int]:
+        for faiss_id in self.ids:
+            yield int(faiss_id)
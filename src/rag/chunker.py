@@ -0,0 +1,241 @@
+"""Module: chunker
+
+Single chunking engine for RAG ingestion (used by src.rag.loader and
+src.rag.embedder).
+
+- Sizes are in tokens of the embedding model (its own tokenizer when
+  available, else src.utils.tokens), so chunks fit the encoder's window
+  instead of being silently truncated.
+- Chunks are built from whole sentences; paragraphs are kept together
+  when the chunk is already mostly full. Only a sentence longer than a
+  whole chunk is split, on word boundaries.
+- Overlap is the trailing sentences of the previous chunk, at most
+  overlap_tokens long (always less than half a chunk).
+- One pass over a stream of (page, text) pieces; a sentence cut by a page
+  or block boundary is carried over, and every chunk records its pages.
+
+Configuration (env):
+- CHUNK_TOKENS          tokens per chunk (default 250; MiniLM reads 256)
+- CHUNK_OVERLAP_TOKENS  overlap between consecutive chunks (default 30)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.utils.tokens import count_tokens
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "250"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "30"))
+
+# Emit at a paragraph break once the chunk is this full
+_PARAGRAPH_FLUSH_RATIO = 0.75
+
+# Budget per join: token counts of separately counted sentences don't
+# quite add up to the count of the joined text
+_JOIN_TOKENS = 1
+
+# An unterminated "sentence" longer than this (x chunk_tokens) is flushed
+_MAX_PENDING_CHARS_PER_TOKEN = 16
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# Whitespace after ., ! or ? (optionally followed by a closing quote/bracket)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+
+TokenCounter = Callable[[str], int]
+
+
+def model_token_counter(model) -> TokenCounter:
+    """Count tokens with an embedding model's own tokenizer.
+
+    Falls back to count_tokens() for encoders without a Hugging Face
+    tokenizer. The tokenizer is looked up on first use, so passing a
+    LazyEmbedder doesn't load the model early.
+    """
+    tokenizer = None
+
+    def count(text: str) -> int:
+        nonlocal tokenizer
+        if tokenizer is None:
+            tokenizer = getattr(model, "tokenizer", None) or False
+        if not tokenizer:
+            return count_tokens(text)
+        return len(tokenizer.encode(text, add_special_tokens=False, verbose=False))
+
+    return count
+
+
+class _Unit:
+    """One sentence (or a piece of an over-long one)."""
+
+    __slots__ = ("text", "tokens", "page", "paragraph_start")
+
+    def __init__(self, text: str, tokens: int, page, paragraph_start: bool) -> None:
+        self.text = text
+        self.tokens = tokens
+        self.page = page
+        self.paragraph_start = paragraph_start
+
+
+class Chunker:
+    """Token-budgeted, sentence-aware text chunker."""
+
+    def __init__(
+        self,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        """Create the chunker.
+
+        Args:
+        ----
+            chunk_tokens: Maximum tokens per chunk.
+            overlap_tokens: Maximum tokens repeated from the previous chunk.
+            token_counter: str -> token count (default: count_tokens).
+
+        """
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens must be positive")
+        if not 0 <= overlap_tokens < chunk_tokens / 2:
+            raise ValueError("overlap_tokens must be below half of chunk_tokens")
+
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count = token_counter or count_tokens
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def chunk_text(self, text: str) -> List[Tuple[str, Dict]]:
+        """Chunk one string; (chunk text, metadata) pairs."""
+        return list(self.chunk_stream([(None, text)]))
+
+    def chunk_stream(
+        self, pieces: Iterable[Tuple[Optional[int], str]]
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Chunk (page, text) pieces as they arrive.
+
+        Metadata holds page_start / page_end when pages are given.
+        """
+        chunk: List[_Unit] = []
+        used = 0
+
+        for unit in self._units(pieces):
+            cost = unit.tokens + (_JOIN_TOKENS if chunk else 0)
+            full = used + cost > self.chunk_tokens
+            paragraph_break = (
+                unit.paragraph_start
+                and used >= self.chunk_tokens * _PARAGRAPH_FLUSH_RATIO
+            )
+            if chunk and (full or paragraph_break):
+                yield self._emit(chunk)
+                chunk = self._overlap(chunk, unit.tokens + _JOIN_TOKENS)
+                used = self._size(chunk)
+                cost = unit.tokens + (_JOIN_TOKENS if chunk else 0)
+
+            chunk.append(unit)
+            used += cost
+
+        if chunk:
+            yield self._emit(chunk)
+
+    # ---------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------
+    @staticmethod
+    def _size(chunk: List[_Unit]) -> int:
+        if not chunk:
+            return 0
+        return sum(u.tokens for u in chunk) + _JOIN_TOKENS * (len(chunk) - 1)
+
+    def _overlap(self, chunk: List[_Unit], next_tokens: int) -> List[_Unit]:
+        """Trailing sentences to repeat, leaving room for the next unit."""
+        budget = min(self.overlap_tokens, self.chunk_tokens - next_tokens)
+        carry: List[_Unit] = []
+        for unit in reversed(chunk):
+            if self._size([unit, *carry]) > budget:
+                break
+            carry.insert(0, unit)
+        return carry
+
+    @staticmethod
+    def _emit(chunk: List[_Unit]) -> Tuple[str, Dict]:
+        parts = []
+        for i, unit in enumerate(chunk):
+            if i:
+                parts.append("\n\n" if unit.paragraph_start else " ")
+            parts.append(unit.text)
+
+        meta: Dict = {}
+        if chunk[0].page is not None:
+            meta = {"page_start": chunk[0].page, "page_end": chunk[-1].page}
+        return "".join(parts), meta
+
+    def _units(
+        self, pieces: Iterable[Tuple[Optional[int], str]]
+    ) -> Iterator[_Unit]:
+        """Sentences of the stream, each counted once."""
+        pending = ""  # unfinished sentence from the previous piece
+        pending_page = None
+        paragraph_start = True
+
+        for page, text in pieces:
+            for p_index, paragraph in enumerate(_PARAGRAPH_RE.split(text)):
+                if p_index:
+                    # Paragraph break: whatever was pending is complete
+                    if pending.strip():
+                        yield from self._sentence(
+                            pending, pending_page, paragraph_start
+                        )
+                    pending = ""
+                    paragraph_start = True
+
+                first_page = page
+                if pending:
+                    paragraph = pending + " " + paragraph
+                    first_page = pending_page
+
+                sentences = _SENTENCE_END_RE.split(paragraph)
+                for s_index, sentence in enumerate(sentences):
+                    sentence_page = first_page if s_index == 0 else page
+                    if s_index == len(sentences) - 1:
+                        # May continue in the next piece
+                        pending, pending_page = sentence, sentence_page
+                    elif sentence.strip():
+                        yield from self._sentence(
+                            sentence, sentence_page, paragraph_start
+                        )
+                        paragraph_start = False
+
+                # Text without sentence ends (tables, lists) mustn't pile up
+                if len(pending) > self.chunk_tokens * _MAX_PENDING_CHARS_PER_TOKEN:
+                    yield from self._sentence(pending, pending_page, paragraph_start)
+                    pending = ""
+                    paragraph_start = False
+
+        if pending.strip():
+            yield from self._sentence(pending, pending_page, paragraph_start)
+
+    def _sentence(self, text: str, page, paragraph_start: bool) -> Iterator[_Unit]:
+        text = " ".join(text.split())
+        tokens = self.count(text)
+        if tokens <= self.chunk_tokens:
+            yield _Unit(text, tokens, page, paragraph_start)
+            return
+
+        # Over-long sentence: split into word windows of about chunk_tokens
+        words = text.split(" ")
+        if len(words) == 1:
+            # A single giant "word"; the encoder truncates it, nothing to do
+            yield _Unit(text, self.chunk_tokens, page, paragraph_start)
+            return
+        per_piece = max(1, int(len(words) * self.chunk_tokens / tokens * 0.9))
+        for start in range(0, len(words), per_piece):
+            yield from self._sentence(
+                " ".join(words[start : start + per_piece]),
+                page,
+                paragraph_start and start == 0,
+            )
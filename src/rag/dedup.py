@@ -0,0 +1,266 @@
+"""Module: dedup
+
+Content-addressed deduplication for RAG ingestion.
+
+- Documents: sha256 of the file bytes. A file whose content is already
+  indexed (under any name) is skipped before it is parsed.
+- Chunks, exact: sha256 of the normalized text (lowercased, whitespace
+  collapsed), so repeated boilerplate pages/paragraphs are indexed once.
+- Chunks, near-duplicate: 64-bit SimHash over word 3-gram shingles. A
+  chunk within RAG_NEAR_DUP_DISTANCE bits of an indexed one is skipped.
+  Lookups use the pigeonhole trick: the hash is split into 6 bands of
+  10-11 bits, and any hash within 5 bits of another shares at least one
+  band exactly, so candidates come from an indexed equality lookup.
+
+Seen hashes live in a small SQLite file (truncated 128-bit digests)
+next to the FAISS index. Every hash records the document it was indexed
+under; deleting or re-adding that document forgets its hashes. A chunk
+skipped as a duplicate of another document is not restored if that
+document is deleted later.
+
+Configuration (env):
+- RAG_DEDUP              skip duplicate documents/chunks (default true)
+- RAG_NEAR_DUP_DISTANCE  max SimHash Hamming distance, 0-5 (default 4,
+                         about a one- or two-word edit in a full chunk;
+                         0 disables near-duplicate detection)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+RAG_DEDUP = os.getenv("RAG_DEDUP", "true").lower() in ("1", "true", "yes")
+RAG_NEAR_DUP_DISTANCE = int(os.getenv("RAG_NEAR_DUP_DISTANCE", "4"))
+
+DEDUP_FILE = "dedup.db"
+
+# Band layout supports distances up to _BANDS - 1
+_BANDS = 6
+_BAND_BITS = [64 // _BANDS + (i < 64 % _BANDS) for i in range(_BANDS)]
+_SHINGLE = 3
+# Chunks with fewer shingles than this are only checked for exact copies
+# (SimHash of a few words matches too much unrelated text)
+_MIN_SHINGLES = 8
+
+_WORD_RE = re.compile(r"\w+")
+_READ_BLOCK = 1 << 20
+_MASK64 = (1 << 64) - 1
+
+
+# ---------------------------------------------------------
+# Hashing
+# ---------------------------------------------------------
+def file_digest(path: str) -> str:
+    """Hex sha256 of a file, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_digest(text: str) -> bytes:
+    """128-bit digest of a chunk's normalized text."""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).digest()[:16]
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of text's word 3-grams (None if the text is too short)."""
+    words = _WORD_RE.findall(text.lower())
+    shingles = [
+        " ".join(words[i : i + _SHINGLE])
+        for i in range(max(1, len(words) - _SHINGLE + 1))
+    ]
+    if len(shingles) < _MIN_SHINGLES:
+        return None
+
+    hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            for s in shingles
+        ],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.astype(np.int64).sum(axis=0) * 2 - len(shingles)
+    return sum(1 << i for i in range(64) if votes[i] > 0)
+
+
+def _signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _bands(value: int) -> List[int]:
+    parts = []
+    for bits in _BAND_BITS:
+        parts.append(value & ((1 << bits) - 1))
+        value >>= bits
+    return parts
+
+
+# ---------------------------------------------------------
+# Seen-hash index
+# ---------------------------------------------------------
+class DedupIndex:
+    """On-disk record of indexed documents and chunks."""
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        near_distance: int = RAG_NEAR_DUP_DISTANCE,
+        timeout: float = 10.0,
+    ) -> None:
+        """Open (or create) the index.
+
+        Args:
+        ----
+            path: SQLite file; ":memory:" keeps it in this process only.
+            near_distance: Max SimHash Hamming distance (0 disables).
+            timeout: Seconds to wait for another process's write lock.
+
+        """
+        if not 0 <= near_distance < _BANDS:
+            raise ValueError(f"near_distance must be between 0 and {_BANDS - 1}")
+
+        self.path = path
+        self.near_distance = near_distance
+        self.skipped_documents = 0
+        self.skipped_exact = 0
+        self.skipped_near = 0
+
+        # Ingestion is already serialized by RAGPipeline; one connection
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " hash TEXT PRIMARY KEY, doc_id TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS documents_doc ON documents (doc_id);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " hash BLOB PRIMARY KEY, doc_id TEXT NOT NULL) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id);"
+            "CREATE TABLE IF NOT EXISTS simhashes ("
+            " band INTEGER NOT NULL, value INTEGER NOT NULL,"
+            " simhash INTEGER NOT NULL, doc_id TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS simhashes_band ON simhashes (band, value);"
+            "CREATE INDEX IF NOT EXISTS simhashes_doc ON simhashes (doc_id);"
+        )
+
+    # ---------------------------------------------------------
+    # Documents
+    # ---------------------------------------------------------
+    def document_owner(self, digest: str) -> Optional[str]:
+        """doc_id already indexed with this content, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id FROM documents WHERE hash = ?", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_document(self, digest: str, doc_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (hash, doc_id) VALUES (?, ?)",
+                (digest, doc_id),
+            )
+
+    def doc_ids(self) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM documents UNION SELECT doc_id FROM chunks"
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def forget(self, doc_id: str) -> None:
+        """Drop every hash recorded for doc_id."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for table in ("documents", "chunks", "simhashes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("COMMIT")
+
+    def retain(self, doc_ids: Iterable[str]) -> None:
+        """Forget documents that are no longer indexed (e.g. index reset)."""
+        live = set(doc_ids)
+        for doc_id in self.doc_ids() - live:
+            self.forget(doc_id)
+
+    # ---------------------------------------------------------
+    # Chunks
+    # ---------------------------------------------------------
+    def _near_duplicate(self, value: int) -> bool:
+        for band, part in enumerate(_bands(value)):
+            rows = self._conn.execute(
+                "SELECT simhash FROM simhashes WHERE band = ? AND value = ?",
+                (band, part),
+            ).fetchall()
+            for (other,) in rows:
+                if bin((other & _MASK64) ^ value).count("1") <= self.near_distance:
+                    return True
+        return False
+
+    def filter_chunks(self, doc_id: str, texts: List[str]) -> List[bool]:
+        """Which texts are new; the new ones are recorded under doc_id.
+
+        Duplicates within texts are caught too (the first copy is kept).
+        """
+        keep: List[bool] = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for text in texts:
+                    digest = chunk_digest(text)
+                    if self._conn.execute(
+                        "SELECT 1 FROM chunks WHERE hash = ?", (digest,)
+                    ).fetchone():
+                        self.skipped_exact += 1
+                        keep.append(False)
+                        continue
+
+                    value = simhash(text) if self.near_distance else None
+                    if value is not None and self._near_duplicate(value):
+                        self.skipped_near += 1
+                        keep.append(False)
+                        continue
+
+                    self._conn.execute(
+                        "INSERT INTO chunks (hash, doc_id) VALUES (?, ?)",
+                        (digest, doc_id),
+                    )
+                    if value is not None:
+                        self._conn.executemany(
+                            "INSERT INTO simhashes (band, value, simhash, doc_id)"
+                            " VALUES (?, ?, ?, ?)",
+                            [
+                                (band, part, _signed(value), doc_id)
+                                for band, part in enumerate(_bands(value))
+                            ],
+                        )
+                    keep.append(True)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return keep
+
+    def metrics(self) -> Dict:
+        return {
+            "skipped_documents": self.skipped_documents,
+            "skipped_exact_chunks": self.skipped_exact,
+            "skipped_near_chunks": self.skipped_near,
+        }
@@ -8,10 +8,12 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import List
+from typing import List, Optional
 
 from PyPDF2 import PdfReader
 
+from src.rag.chunker import Chunker
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
@@ -19,9 +21,8 @@ LOGGER.setLevel(logging.INFO)
 class DocumentLoader:
     """Simple loader for PDFs and plain text files."""
 
-    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100) -> None:
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+    def __init__(self, chunker: Optional[Chunker] = None) -> None:
+        self.chunker = chunker or Chunker()
 
     # -----------------------------------------------------------
     # Load a single file
@@ -55,26 +56,7 @@ class DocumentLoader:
 
     # -----------------------------------------------------------
     def _split_into_chunks(self, text: str) -> List[str]:
-        """Basic chunking without LangChain."""
+        """Token-budgeted, sentence-aware chunks (see src.rag.chunker)."""
         if not text.strip():
             return []
-
-        chunks = []
-        words = text.split()
-
-        current = []
-        length = 0
-
-        for w in words:
-            if length + len(w) > self.chunk_size:
-                chunks.append(" ".join(current))
-                current = current[-self.chunk_overlap // 5 :]  # word-level overlap
-                length = sum(len(x) for x in current)
-
-            current.append(w)
-            length += len(w)
-
-        if current:
-            chunks.append(" ".join(current))
-
-        return chunks
+        return [chunk for chunk, _ in self.chunker.chunk_text(text)]
@@ -0,0 +1,406 @@
+"""Module: embedding_backends
+
+Interchangeable sentence-embedding backends behind SentenceTransformer's
+encode() interface, so VectorStore, the router cache and the local
+classifier work unchanged whichever one is loaded.
+
+EMBED_BACKEND:
+- "torch" (default) : sentence_transformers.SentenceTransformer
+- "int8"            : same model with its Linear layers dynamically
+                      quantized to int8 (no extra dependencies)
+- "onnx"            : ONNX Runtime session over a model exported with
+                      `export` below (EMBED_ONNX_PATH); needs onnxruntime
+
+Unavailable backends fall back to "torch" with a warning.
+
+The export's parity with torch (see parity_check()) is recorded in its
+embedder.json by `export` and by `parity --backend onnx`. An export whose
+recorded min cosine is below PARITY_MIN_COSINE is not loaded (torch is
+used instead); one without a record loads with a warning.
+
+LazyEmbedder defers the (multi-second) model load to the first encode()
+or an explicit load(), e.g. from the API's background warm-up.
+
+CLI:
+    python -m src.rag.embedding_backends export --out onnx_model [--int8]
+    python -m src.rag.embedding_backends parity --backend onnx
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+EMBED_ONNX_PATH = os.getenv("EMBED_ONNX_PATH", "onnx_model")
+
+BACKENDS = ("torch", "int8", "onnx")
+ONNX_CONFIG = "embedder.json"
+
+# Minimum per-sentence cosine similarity to the reference vectors
+PARITY_MIN_COSINE = 0.99
+PARITY_TEXTS = [
+    "What is the derivative of x squared?",
+    "Explain photosynthesis to a ten year old.",
+    "Is a verbal agreement legally binding?",
+    "What are common symptoms of dehydration?",
+    "Write a Python function that reverses a linked list.",
+    "Hello!",
+    "The quick brown fox jumps over the lazy dog. " * 8,
+]
+
+
+# ---------------------------------------------------------
+# ONNX Runtime backend
+# ---------------------------------------------------------
+class OnnxSentenceEncoder:
+    """Mean/CLS-pooled transformer embeddings computed with ONNX Runtime."""
+
+    def __init__(self, path: str, threads: Optional[int] = None) -> None:
+        """Load an exported model directory (see export_onnx()).
+
+        Args:
+        ----
+            path: Directory with embedder.json, the .onnx file and tokenizer.
+            threads: intra-op threads (default: ONNX Runtime's choice).
+
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path, ONNX_CONFIG), encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(
+            os.path.join(path, self.config["file"]),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.max_seq_length = self.config["max_seq_length"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feed = {k: v.astype("int64") for k, v in tokens.items() if k in self._inputs}
+        hidden = self.session.run(None, feed)[0]
+
+        if self.config["pooling"] == "cls":
+            return hidden[:, 0]
+        mask = tokens["attention_mask"][..., None].astype("float32")
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        **_: object,
+    ) -> np.ndarray:
+        """Same contract as SentenceTransformer.encode() (numpy output)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype="float32")
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), "float32")
+        for start in range(0, len(order), batch_size):
+            idx = order[start : start + batch_size]
+            out[idx] = self._forward([texts[i] for i in idx])
+
+        if normalize_embeddings or self.config["normalize"]:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+
+# ---------------------------------------------------------
+# Loading
+# ---------------------------------------------------------
+def _load_torch(model_name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _load_int8(model_name: str):
+    import torch
+
+    model = _load_torch(model_name).to("cpu")
+    torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+    return model
+
+
+def load_embedding_model(model_name: str, backend: Optional[str] = None):
+    """Load model_name with the requested backend (default EMBED_BACKEND).
+
+    Returns (model, backend actually used).
+    """
+    backend = (backend or EMBED_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if backend == "onnx":
+        try:
+            model = OnnxSentenceEncoder(EMBED_ONNX_PATH)
+        except (ImportError, OSError) as err:
+            LOGGER.warning(f"ONNX embedding backend unavailable ({err}); using torch")
+            return _load_torch(model_name), "torch"
+        if model.config.get("source") != model_name:
+            LOGGER.warning(
+                f"{EMBED_ONNX_PATH} was exported from {model.config.get('source')}, "
+                f"not {model_name}"
+            )
+        parity = model.config.get("parity")
+        if parity is None:
+            LOGGER.warning(
+                f"{EMBED_ONNX_PATH} has no parity record; check it with "
+                "`python -m src.rag.embedding_backends parity --backend onnx`"
+            )
+        elif parity["min_cosine"] < PARITY_MIN_COSINE:
+            LOGGER.warning(
+                f"{EMBED_ONNX_PATH} failed parity (min cosine "
+                f"{parity['min_cosine']} < {PARITY_MIN_COSINE}); using torch"
+            )
+            return _load_torch(model_name), "torch"
+        return model, "onnx"
+
+    if backend == "int8":
+        return _load_int8(model_name), "int8"
+    return _load_torch(model_name), "torch"
+
+
+class LazyEmbedder:
+    """Stand-in for an embedding model that loads it on first use."""
+
+    def __init__(self, model_name: str, backend: Optional[str] = None) -> None:
+        self.model_name = model_name
+        self.requested_backend = (backend or EMBED_BACKEND).lower()
+        self._model = None
+        self._backend: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Load the model now (no-op once loaded); returns it."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model, self._backend = load_embedding_model(
+                        self.model_name, self.requested_backend
+                    )
+                    self._model = model
+                    LOGGER.info(
+                        f"Loaded embedding model {self.model_name} ({self._backend}) "
+                        f"in {time.perf_counter() - start:.1f}s"
+                    )
+        return self._model
+
+    @property
+    def backend(self) -> str:
+        """Backend actually in use (loads the model)."""
+        self.load()
+        return self._backend
+
+    def encode(self, *args, **kwargs):
+        return self.load().encode(*args, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.load().get_sentence_embedding_dimension()
+
+    def __getattr__(self, name: str):
+        # Everything else (multi-process pool helpers, ...) goes to the model
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+# ---------------------------------------------------------
+# Export / parity
+# ---------------------------------------------------------
+def export_onnx(model_name: str, out_dir: str, int8: bool = False) -> str:
+    """Export a SentenceTransformer to an ONNX model directory.
+
+    Args:
+    ----
+        model_name: Hugging Face / sentence-transformers model id.
+        out_dir: Output directory (created if needed).
+        int8: Also write a dynamically int8-quantized model and use it.
+
+    Returns:
+    -------
+        out_dir
+
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    pooling = next(m for m in st if isinstance(m, Pooling))
+    normalize = any(isinstance(m, Normalize) for m in st)
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model) -> None:
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            ).last_hidden_state
+
+    os.makedirs(out_dir, exist_ok=True)
+    onnx_path = os.path.join(out_dir, "model.onnx")
+    sample = st.tokenizer(["hello world"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    args = tuple(
+        sample.get(n, torch.zeros_like(sample["input_ids"])) for n in names
+    )
+
+    torch.onnx.export(
+        _Encoder(transformer),
+        args,
+        onnx_path,
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "seq"} for n in names + ["last_hidden_state"]},
+        opset_version=17,
+    )
+
+    model_file = "model.onnx"
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        model_file = "model.int8.onnx"
+        quantize_dynamic(
+            onnx_path, os.path.join(out_dir, model_file), weight_type=QuantType.QInt8
+        )
+
+    st.tokenizer.save_pretrained(out_dir)
+    config = {
+        "source": model_name,
+        "file": model_file,
+        "pooling": "cls" if pooling.pooling_mode_cls_token else "mean",
+        "normalize": normalize,
+        "max_seq_length": st.max_seq_length,
+        "dim": st.get_sentence_embedding_dimension(),
+    }
+    with open(os.path.join(out_dir, ONNX_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    parity = parity_check(st, OnnxSentenceEncoder(out_dir))
+    record_parity(out_dir, parity)
+    LOGGER.info(f"Exported {model_name} to {out_dir} ({model_file}): {parity}")
+    if not parity["ok"]:
+        LOGGER.warning(f"{out_dir} failed parity; it will not be loaded")
+    return out_dir
+
+
+def record_parity(path: str, result: Dict) -> None:
+    """Store a parity_check() result in an export's embedder.json."""
+    config_path = os.path.join(path, ONNX_CONFIG)
+    with open(config_path, encoding="utf-8") as f:
+        config = json.load(f)
+    config["parity"] = {**result, "checked_at": time.time()}
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+def parity_check(
+    reference,
+    candidate,
+    texts: Optional[List[str]] = None,
+    min_cosine: float = PARITY_MIN_COSINE,
+) -> Dict:
+    """Compare two backends' embeddings sentence by sentence.
+
+    Returns {min_cosine, mean_cosine, threshold, ok} where ok means every
+    sentence's cosine similarity to the reference is at least min_cosine
+    (the threshold).
+    """
+    texts = texts or PARITY_TEXTS
+    ref = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    cand = candidate.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    cosines = np.sum(np.asarray(ref) * np.asarray(cand), axis=1)
+    return {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "threshold": min_cosine,
+        "ok": bool(cosines.min() >= min_cosine),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding backend tools")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export the model to ONNX")
+    export.add_argument("--out", default=EMBED_ONNX_PATH)
+    export.add_argument("--int8", action="store_true")
+
+    parity = sub.add_parser("parity", help="compare a backend against torch")
+    parity.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        out_dir = export_onnx(args.model, args.out, int8=args.int8)
+        with open(os.path.join(out_dir, ONNX_CONFIG), encoding="utf-8") as f:
+            result = json.load(f)["parity"]
+        print(json.dumps({"backend": "onnx", **result}))
+        if not result["ok"]:
+            raise SystemExit(1)
+        return
+
+    reference, _ = load_embedding_model(args.model, "torch")
+    if args.backend == "onnx":
+        # Directly: load_embedding_model() won't load an export that failed
+        candidate, used = OnnxSentenceEncoder(EMBED_ONNX_PATH), "onnx"
+    else:
+        candidate, used = load_embedding_model(args.model, args.backend)
+    result = parity_check(reference, candidate)
+    if used == "onnx":
+        record_parity(EMBED_ONNX_PATH, result)
+    print(json.dumps({"backend": used, **result}))
+    if not result["ok"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
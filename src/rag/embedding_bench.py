@@ -0,0 +1,138 @@
+"""Module: embedding_bench
+
+Load time, memory and throughput of the embedding backends.
+
+Each backend runs in a fresh spawned process so load time and RSS are
+not skewed by whatever an earlier backend already imported. Vectors for
+PARITY_TEXTS come back to the parent and are compared with the torch
+reference.
+
+Usage:
+    python -m src.rag.embedding_bench --backends torch int8 onnx --texts 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import random
+import resource
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.rag.embedding_backends import (
+    BACKENDS,
+    PARITY_MIN_COSINE,
+    PARITY_TEXTS,
+    load_embedding_model,
+)
+
+_WORDS = (
+    "model data query answer patient contract theorem energy function court "
+    "symptom proof cell market graph learning legal dosage clause vector"
+).split()
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux), else the peak RSS."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _sample_texts(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(_WORDS, k=rng.randint(8, 120))) for _ in range(n)
+    ]
+
+
+def _bench_one(model_name: str, backend: str, n_texts: int, batch_size: int, out) -> None:
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model, used = load_embedding_model(model_name, backend)
+    load_s = time.perf_counter() - start
+
+    texts = _sample_texts(n_texts)
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+
+    start = time.perf_counter()
+    model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    encode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in texts[:200]:
+        model.encode([text], convert_to_numpy=True)
+    single_ms = (time.perf_counter() - start) / min(200, len(texts)) * 1000
+
+    out.put(
+        {
+            "backend": used,
+            "load_s": round(load_s, 2),
+            "rss_mb": round(_rss_mb() - rss_before, 1),
+            "texts_per_s": round(len(texts) / encode_s, 1),
+            "single_query_ms": round(single_ms, 2),
+            "parity": np.asarray(
+                model.encode(PARITY_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+            ).tolist(),
+        }
+    )
+
+
+def run(
+    model_name: str, backends: List[str], n_texts: int = 2000, batch_size: int = 64
+) -> List[Dict]:
+    """Benchmark each backend in its own process; rows in backends order."""
+    ctx = mp.get_context("spawn")
+    rows = []
+    for backend in backends:
+        out = ctx.Queue()
+        proc = ctx.Process(
+            target=_bench_one, args=(model_name, backend, n_texts, batch_size, out)
+        )
+        proc.start()
+        rows.append(out.get())
+        proc.join()
+
+    reference = next((r["parity"] for r in rows if r["backend"] == "torch"), None)
+    for row in rows:
+        vectors = np.asarray(row.pop("parity"))
+        if reference is None:
+            row["min_cosine"] = None
+            continue
+        cosines = np.sum(vectors * np.asarray(reference), axis=1)
+        row["min_cosine"] = round(float(cosines.min()), 5)
+        row["parity_ok"] = bool(cosines.min() >= PARITY_MIN_COSINE)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    backends = args.backends
+    if "torch" not in backends:
+        backends = ["torch", *backends]  # reference for the parity column
+
+    header = f"{'backend':>8} {'load_s':>7} {'rss_mb':>7} {'texts/s':>9} {'1q_ms':>7} {'min_cos':>8}"
+    print(header)
+    for row in run(args.model, backends, args.texts, args.batch_size):
+        print(
+            f"{row['backend']:>8} {row['load_s']:>7} {row['rss_mb']:>7} "
+            f"{row['texts_per_s']:>9} {row['single_query_ms']:>7} {row['min_cosine']!s:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
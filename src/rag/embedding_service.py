@@ -0,0 +1,253 @@
+"""Module: embedding_service
+
+Batched chunk embedding with a persistent, content-addressed cache.
+
+- Texts are looked up in an SQLite cache keyed by (model, sha256(text)),
+  so re-uploaded or overlapping documents only embed the chunks that are
+  actually new.
+- Misses are sorted by length before batching (less padding per batch)
+  and encoded EMBED_BATCH_SIZE at a time.
+- Large batches (>= EMBED_POOL_MIN_TEXTS misses) go through
+  SentenceTransformer's multi-process pool, one process per core; the pool
+  is started on first use and stopped by close(). Only the torch backend
+  uses the pool.
+
+Configuration (env):
+- EMBED_BATCH_SIZE      texts per forward pass (default 64)
+- EMBED_PROCESSES       pool processes (default: CPU count; 1 disables)
+- EMBED_POOL_MIN_TEXTS  smallest batch worth the pool overhead (default 512)
+- EMBED_CACHE_PATH      SQLite cache file (default "embeddings.db", "" disables)
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_PROCESSES = int(os.getenv("EMBED_PROCESSES", "0")) or (os.cpu_count() or 1)
+EMBED_POOL_MIN_TEXTS = int(os.getenv("EMBED_POOL_MIN_TEXTS", "512"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embeddings.db")
+
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_CHUNK = 500
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk float32 embeddings keyed by (model, text hash).
+
+    Safe to share between threads (one connection per thread) and worker
+    processes (SQLite WAL).
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " vec BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        conn = self._conn()
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), _LOOKUP_CHUNK):
+            part = unique[start : start + _LOOKUP_CHUNK]
+            rows = conn.execute(
+                "SELECT hash, vec FROM embeddings WHERE model = ?"
+                f" AND hash IN ({','.join('?' * len(part))})",
+                (model, *part),
+            ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype="float32")
+
+        self.hits += sum(1 for h in hashes if h in found)
+        self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, hash, vec) VALUES (?, ?, ?)",
+                [
+                    (model, digest, np.asarray(vec, dtype="float32").tobytes())
+                    for digest, vec in items.items()
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingService:
+    """Embeds chunk texts in sorted batches, reusing cached vectors."""
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        batch_size: int = EMBED_BATCH_SIZE,
+        processes: int = EMBED_PROCESSES,
+        pool_min_texts: int = EMBED_POOL_MIN_TEXTS,
+        cache_path: Optional[str] = EMBED_CACHE_PATH,
+    ) -> None:
+        """Create the service.
+
+        Args:
+        ----
+            model: SentenceTransformer-compatible encoder (or LazyEmbedder).
+            model_name: Cache namespace (vectors of other models never mix).
+            batch_size: Texts per forward pass.
+            processes: Multi-process pool size (1 disables the pool).
+            pool_min_texts: Minimum misses before the pool is used.
+            cache_path: SQLite cache file; None / "" disables caching.
+
+        """
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.processes = processes
+        self.pool_min_texts = pool_min_texts
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Encoding
+    # ---------------------------------------------------------
+    def _backend(self) -> str:
+        return getattr(self.model, "backend", "torch")
+
+    def _namespace(self) -> str:
+        # Quantized / ONNX vectors differ slightly: keep their cache apart
+        backend = self._backend()
+        if backend == "torch":
+            return self.model_name
+        return f"{self.model_name}:{backend}"
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                LOGGER.info(f"Starting embedding pool ({self.processes} processes)")
+                self._pool = self.model.start_multi_process_pool(
+                    target_devices=["cpu"] * self.processes
+                )
+                atexit.register(self.close)
+            return self._pool
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts (longest first, so batches hold similar lengths)."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        ordered = [texts[i] for i in order]
+
+        if (
+            self.processes > 1
+            and len(ordered) >= self.pool_min_texts
+            and self._backend() == "torch"
+        ):
+            emb = self.model.encode_multi_process(
+                ordered, self._get_pool(), batch_size=self.batch_size
+            )
+        else:
+            emb = self.model.encode(
+                ordered, batch_size=self.batch_size, convert_to_numpy=True
+            )
+
+        out = np.empty_like(emb, dtype="float32")
+        out[order] = emb
+        return out
+
+    def encode(self, texts: List[str], cache: bool = True) -> np.ndarray:
+        """Embed texts; float32 array aligned with texts.
+
+        Args:
+        ----
+            texts: Chunk texts.
+            cache: Read/write the on-disk cache (off for one-off queries).
+
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        if not cache or self.cache is None:
+            return self._encode(texts)
+
+        hashes = [_digest(t) for t in texts]
+        cached = self.cache.get_many(self._namespace(), hashes)
+
+        # Embed each distinct missing text once
+        missing: Dict[str, str] = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in cached:
+                missing.setdefault(digest, text)
+
+        if missing:
+            fresh = self._encode(list(missing.values()))
+            new = dict(zip(missing.keys(), fresh))
+            self.cache.put_many(self._namespace(), new)
+            cached.update(new)
+
+        return np.stack([cached[h] for h in hashes]).astype("float32", copy=False)
+
+    # ---------------------------------------------------------
+    # Lifecycle / stats
+    # ---------------------------------------------------------
+    def close(self) -> None:
+        """Stop the multi-process pool, if it was started."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+    def metrics(self) -> Dict:
+        if self.cache is None:
+            return {"cache": None}
+        total = self.cache.hits + self.cache.misses
+        return {
+            "cache": {
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "hit_rate": round(self.cache.hits / total, 4) if total else 0.0,
+            }
+        }
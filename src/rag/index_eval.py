@@ -0,0 +1,134 @@
+"""Module: index_eval
+
+Recall / latency report for the approximate index modes of VectorStore.
+
+An exact flat index (same metric) is rebuilt from the store's chunk texts
+and used as ground truth; the store's own index is then searched for every
+nprobe (IVF, IVF-PQ) or efSearch (HNSW) value and compared against it.
+
+Usage:
+    python -m src.rag.index_eval --index-dir rag_index --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.rag.vectorstore import VectorStore
+
+DEFAULT_SWEEP = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _exact_index(store: VectorStore, batch_size: int = 256):
+    """Flat index over the store's live chunks, keyed by the same ids."""
+    with store._lock:
+        ids = list(store._live_ids())
+        texts = [store._text(i) for i in ids]
+
+    index = None
+    for start in range(0, len(texts), batch_size):
+        emb = store._embed(texts[start : start + batch_size])
+        if index is None:
+            index = store._new_flat_index(emb.shape[1])
+        index.add_with_ids(emb, np.asarray(ids[start : start + batch_size], dtype="int64"))
+    return index
+
+
+def _sample_queries(store: VectorStore, n: int, seed: int = 0) -> List[str]:
+    """Use the leading words of random chunks as stand-in queries."""
+    texts = store.text_chunks
+    rng = random.Random(seed)
+    picked = rng.sample(texts, min(n, len(texts)))
+    return [" ".join(t.split()[:12]) for t in picked]
+
+
+def evaluate(
+    store: VectorStore,
+    queries: List[str],
+    top_k: int = 5,
+    sweep: Optional[List[int]] = None,
+) -> List[Dict]:
+    """Measure recall@top_k and latency of store.search_ids().
+
+    Args:
+    ----
+        store: Loaded VectorStore (any index type).
+        queries: Query strings.
+        top_k: Neighbours compared against the exact result.
+        sweep: nprobe / efSearch values to try (ignored for flat).
+
+    Returns:
+    -------
+        One row per setting: {index_type, param, recall, avg_ms, p95_ms}.
+
+    """
+    q_emb = store._embed(queries, cache=False)
+    _, truth = _exact_index(store).search(q_emb, top_k)
+
+    if store.active_type == "flat":
+        settings = [None]
+    else:
+        settings = list(sweep or DEFAULT_SWEEP)
+
+    rows = []
+    for param in settings:
+        kwargs = {}
+        if store.active_type == "hnsw":
+            kwargs["ef_search"] = param
+        elif param is not None:
+            kwargs["nprobe"] = param
+
+        latencies = []
+        found = 0
+        for q, expected in zip(q_emb, truth):
+            start = time.perf_counter()
+            hits = store.search_ids(q[None, :], top_k, **kwargs)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            expected_ids = {int(i) for i in expected if i >= 0}
+            found += len(expected_ids & {i for i, _ in hits})
+
+        total = sum(int((row >= 0).sum()) for row in truth) or 1
+        rows.append(
+            {
+                "index_type": store.active_type,
+                "param": param,
+                "recall": round(found / total, 4),
+                "avg_ms": round(float(np.mean(latencies)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--index-dir", default="rag_index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--sweep", type=int, nargs="*", help="nprobe / efSearch values to try"
+    )
+    args = parser.parse_args()
+
+    store = VectorStore()
+    if not store.load(args.index_dir, mmap=False):
+        raise SystemExit(f"No vector store found in {args.index_dir}")
+
+    queries = _sample_queries(store, args.queries)
+    print(f"{len(store)} chunks, index={store.active_type}, {len(queries)} queries")
+    print(f"{'param':>8} {'recall':>8} {'avg_ms':>8} {'p95_ms':>8}")
+    for row in evaluate(store, queries, top_k=args.top_k, sweep=args.sweep):
+        param = "-" if row["param"] is None else row["param"]
+        print(
+            f"{param:>8} {row['recall']:>8.4f} {row['avg_ms']:>8.3f} {row['p95_ms']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Module: ingestion
+
+Background ingestion jobs for uploaded documents.
+
+/upload saves files and enqueues a job here; a bounded worker pool parses,
+chunks, embeds and adds them to the shared RAGPipeline while the request
+returns immediately with a job id that can be polled.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+class IngestionQueueFull(RuntimeError):
+    """Raised when too many jobs are already waiting."""
+
+
+class IngestionJob:
+    """State of one ingestion job (a batch of uploaded files)."""
+
+    def __init__(
+        self,
+        paths: List[str],
+        digests: Optional[Dict[str, str]] = None,
+        doc_ids: Optional[Dict[str, str]] = None,
+        on_done: Optional[Callable[["IngestionJob"], None]] = None,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.paths = paths
+        # path -> sha256 computed at upload time (saves dedup a re-read)
+        self.digests = digests or {}
+        # path -> document id it replaces in the index (default: the path)
+        self.doc_ids = doc_ids or {}
+        # Called with the job once it has been indexed successfully
+        self.on_done = on_done
+        self.status = "queued"
+        self.chunks = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "files": self.paths,
+            "chunks": self.chunks,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """Bounded worker pool feeding documents into a RAGPipeline."""
+
+    def __init__(
+        self,
+        rag,
+        max_workers: int = 2,
+        max_pending: int = 32,
+        max_history: int = 1000,
+    ) -> None:
+        """Create the queue.
+
+        Args:
+        ----
+            rag: Pipeline exposing add_documents(paths, digests, doc_ids)
+                -> int (chunks added).
+            max_workers: Concurrent ingestion jobs.
+            max_pending: Queued + running jobs accepted before submit() fails.
+            max_history: Finished jobs remembered for status polling.
+
+        """
+        self.rag = rag
+        self.max_pending = max_pending
+        self.max_history = max_history
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        paths: List[str],
+        digests: Optional[Dict[str, str]] = None,
+        doc_ids: Optional[Dict[str, str]] = None,
+        on_done: Optional[Callable[[IngestionJob], None]] = None,
+    ) -> IngestionJob:
+        """Enqueue paths for ingestion and return the job immediately.
+
+        on_done(job) runs on the worker after a successful ingestion (e.g.
+        to clean up files the job superseded); its errors are logged, not
+        reported as a job failure.
+        """
+        job = IngestionJob(paths, digests, doc_ids, on_done)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise IngestionQueueFull(
+                    f"{self._pending} ingestion jobs pending; try again later"
+                )
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim_history(self) -> None:
+        # Drop oldest finished jobs beyond max_history (never active ones)
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in [
+            j.id for j in self._jobs.values() if j.status in ("done", "failed")
+        ][:excess]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestionJob) -> None:
+        job.status = "running"
+        try:
+            job.chunks = self.rag.add_documents(job.paths, job.digests, job.doc_ids)
+            job.status = "done"
+            LOGGER.info(f"Ingestion job {job.id}: {job.chunks} chunks indexed")
+            if job.on_done is not None:
+                try:
+                    job.on_done(job)
+                except Exception as err:
+                    LOGGER.warning(f"Ingestion job {job.id} cleanup failed: {err}")
+        except Exception as err:
+            job.status = "failed"
+            job.error = str(err)
+            LOGGER.error(f"Ingestion job {job.id} failed: {err}")
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {
+            "pending": self._pending,
+            **{s: statuses.count(s) for s in ("queued", "running", "done", "failed")},
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,69 +1,171 @@
-"""Document Loader — PDF + TXT → clean text chunks."""
+"""Document Loader — PDF + TXT → clean text chunks.
+
+Documents are streamed: pages (PDF) or blocks (TXT) are read one at a
+time and chunked as they arrive, so peak memory depends on the chunk size
+and the small window of pages in flight, not on the document size.
+
+Large PDFs are extracted page-parallel in a process pool (PDF_WORKERS,
+used from PDF_PARALLEL_MIN_PAGES pages on); the pool is started on first
+use and shared by all loads, so its spawn cost is paid once per process,
+not per document. Each chunk records the pages it came from. Chunking
+itself is src.rag.chunker (token- and sentence-aware).
+"""
 
 from __future__ import annotations
 
 import logging
+import multiprocessing as mp
 import os
-from typing import List
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
 from PyPDF2 import PdfReader
 
+from src.rag.chunker import Chunker
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+# Text files are read this many characters at a time
+TXT_BLOCK_CHARS = 64 * 1024
+
+# (page number or None, text)
+Page = Tuple[Optional[int], str]
+
+
+# ---------------------------------------------------------
+# PDF page extraction (runs in worker processes)
+# ---------------------------------------------------------
+# Readers a worker has open, keyed by (path, mtime_ns, size); a few, since
+# pages of concurrently loaded PDFs interleave
+_WORKER_READERS: "OrderedDict[Tuple[str, int, int], PdfReader]" = OrderedDict()
+_WORKER_MAX_READERS = 4
+
+
+def _extract_page(key: Tuple[str, int, int], index: int) -> str:
+    reader = _WORKER_READERS.get(key)
+    if reader is None:
+        reader = _WORKER_READERS[key] = PdfReader(key[0])
+        if len(_WORKER_READERS) > _WORKER_MAX_READERS:
+            _WORKER_READERS.popitem(last=False)
+    else:
+        _WORKER_READERS.move_to_end(key)
+    return reader.pages[index].extract_text() or ""
+
+
+_PDF_POOL: Optional[ProcessPoolExecutor] = None
+_PDF_POOL_LOCK = threading.Lock()
+
+
+def _pdf_pool() -> ProcessPoolExecutor:
+    """The process pool shared by all PDF loads (started on first use)."""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            _PDF_POOL = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS, mp_context=mp.get_context("spawn")
+            )
+        return _PDF_POOL
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next load starts a fresh one."""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is pool:
+            _PDF_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
 
 class DocumentLoader:
     """Loads documents and splits into chunks."""
 
-    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100) -> None:
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+    def __init__(self, chunker: Optional[Chunker] = None) -> None:
+        self.chunker = chunker or Chunker()
 
     def load(self, path: str) -> List[str]:
+        """All chunk texts of a document (see iter_chunks() to stream)."""
+        return [text for text, _ in self.iter_chunks(path)]
+
+    def iter_chunks(self, path: str) -> Iterator[Tuple[str, Dict]]:
+        """Yield (chunk text, metadata) while the document is being read.
+
+        Metadata holds page_start / page_end for PDFs, nothing for text.
+        """
+        return self.chunker.chunk_stream(self.iter_pages(path))
+
+    def iter_pages(self, path: str) -> Iterator[Page]:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Document not found: {path}")
 
         ext = path.lower().split(".")[-1]
 
         if ext == "pdf":
-            text = self._load_pdf(path)
+            return self._load_pdf(path)
         elif ext in ("txt", "md"):
-            text = self._load_txt(path)
+            return self._load_txt(path)
         else:
             raise ValueError(f"Unsupported file type: {ext}")
 
-        return self._chunk(text)
-
-    def _load_pdf(self, path: str) -> str:
+    def _load_pdf(self, path: str) -> Iterator[Page]:
         LOGGER.info(f"Loading PDF: {path}")
         reader = PdfReader(path)
-        return "\n".join(page.extract_text() or "" for page in reader.pages)
-
-    def _load_txt(self, path: str) -> str:
+        n_pages = len(reader.pages)
+
+        if PDF_WORKERS <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+            for i, page in enumerate(reader.pages):
+                yield i + 1, page.extract_text() or ""
+            return
+
+        # Keep only a few pages per worker in flight so extraction can't
+        # run far ahead of chunking/embedding and pile up in memory.
+        del reader
+        window = PDF_WORKERS * 4
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        pool = _pdf_pool()
+        pending: Deque = deque()
+        try:
+            next_page = 0
+            while next_page < n_pages or pending:
+                while next_page < n_pages and len(pending) < window:
+                    pending.append(pool.submit(_extract_page, key, next_page))
+                    next_page += 1
+                page_no = next_page - len(pending) + 1
+                yield page_no, pending.popleft().result()
+        except BrokenProcessPool:
+            _discard_pdf_pool(pool)
+            raise
+        finally:
+            # Abandoned or failed load: don't leave its pages queued
+            for future in pending:
+                future.cancel()
+
+    def _load_txt(self, path: str) -> Iterator[Page]:
         LOGGER.info(f"Loading TXT: {path}")
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
-
-    def _chunk(self, text: str) -> List[str]:
-        if not text.strip():
-            return []
-
-        words = text.split()
-        chunks = []
-        chunk = []
-
-        curr_len = 0
-
-        for word in words:
-            if curr_len + len(word) > self.chunk_size:
-                chunks.append(" ".join(chunk))
-                chunk = chunk[-self.chunk_overlap :]  # overlap
-                curr_len = sum(len(w) for w in chunk)
-
-            chunk.append(word)
-            curr_len += len(word)
-
-        if chunk:
-            chunks.append(" ".join(chunk))
-
-        return chunks
+            carry = ""
+            while True:
+                block = f.read(TXT_BLOCK_CHARS)
+                if not block:
+                    break
+                # Don't split a word across blocks
+                block = carry + block
+                cut = max(block.rfind(" "), block.rfind("\n"))
+                if cut <= 0:
+                    if len(block) <= TXT_BLOCK_CHARS:
+                        carry = block
+                        continue
+                    # No whitespace for over a block: cut anyway, so the
+                    # carry (and memory) can't grow with the file
+                    cut = len(block)
+                carry = block[cut:]
+                yield None, block[:cut]
+            if carry:
+                yield None, carry
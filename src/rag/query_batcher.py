@@ -0,0 +1,209 @@
+"""Module: query_batcher
+
+Query-side embedding for concurrent RAG lookups.
+
+- Query embeddings are kept in an LRU (TTLCache), so repeated questions
+  skip the encoder entirely.
+- Lookups arriving within RAG_BATCH_WAIT_MS of each other are collected by
+  one background thread into a single encode() call and one batched
+  index search, then the results are handed back to each caller. Under
+  concurrency that replaces many tiny forward passes fighting over the
+  GIL with a few larger ones.
+
+Configuration (env):
+- RAG_QUERY_CACHE_SIZE  cached query embeddings (default 4096, 0 disables)
+- RAG_QUERY_CACHE_TTL   seconds a cached embedding lives (default 3600)
+- RAG_BATCH_MAX         queries per batch (default 32, 1 disables batching)
+- RAG_BATCH_WAIT_MS     how long to wait for more queries (default 2)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.ttl_cache import TTLCache
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "4096"))
+RAG_QUERY_CACHE_TTL = float(os.getenv("RAG_QUERY_CACHE_TTL", "3600"))
+RAG_BATCH_MAX = int(os.getenv("RAG_BATCH_MAX", "32"))
+RAG_BATCH_WAIT_MS = float(os.getenv("RAG_BATCH_WAIT_MS", "2"))
+
+Hits = List[Tuple[int, float]]
+
+
+class _Request:
+    __slots__ = ("query", "top_k", "nprobe", "ef_search", "embedding", "future")
+
+    def __init__(self, query, top_k, nprobe, ef_search, embedding) -> None:
+        self.query = query
+        self.top_k = top_k
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.embedding: Optional[np.ndarray] = embedding
+        self.future: "Future[Hits]" = Future()
+
+
+class QueryBatcher:
+    """Embeds and searches queries for a VectorStore in micro-batches."""
+
+    def __init__(
+        self,
+        store,
+        max_batch: int = RAG_BATCH_MAX,
+        max_wait: float = RAG_BATCH_WAIT_MS / 1000,
+        cache_size: int = RAG_QUERY_CACHE_SIZE,
+        cache_ttl: Optional[float] = RAG_QUERY_CACHE_TTL or None,
+    ) -> None:
+        """Create the batcher.
+
+        Args:
+        ----
+            store: VectorStore providing _embed() and search_ids().
+            max_batch: Maximum queries per encode / search call.
+            max_wait: Seconds to wait for more queries after the first one.
+            cache_size: Query embeddings kept in the LRU (0 disables it).
+            cache_ttl: Seconds a cached embedding stays valid.
+
+        """
+        self.store = store
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl) if cache_size else None
+
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_queries = 0
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> Hits:
+        """(id, score) hits for query; blocks until its batch has run."""
+        embedding = self._cached(query)
+        if embedding is not None:
+            self.cache_hits += 1
+
+        if self.max_batch == 1:
+            if embedding is None:
+                embedding = self._embed_and_cache([query])[0]
+            return self.store.search_ids(
+                embedding[None, :], top_k, nprobe=nprobe, ef_search=ef_search
+            )[0]
+
+        request = _Request(query, top_k, nprobe, ef_search, embedding)
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future.result()
+
+    def metrics(self) -> Dict:
+        return {
+            "query_cache_hits": self.cache_hits,
+            "batches": self.batches,
+            "avg_batch_size": (
+                round(self.batched_queries / self.batches, 2) if self.batches else 0.0
+            ),
+        }
+
+    # ---------------------------------------------------------
+    # Embedding cache
+    # ---------------------------------------------------------
+    def _key(self, query: str) -> Tuple[str, str]:
+        # Cosine stores normalize embeddings, l2 ones don't
+        return (self.store.metric, query)
+
+    def _cached(self, query: str) -> Optional[np.ndarray]:
+        if self.cache is None:
+            return None
+        return self.cache.get(self._key(query))
+
+    def _embed_and_cache(self, queries: List[str]) -> np.ndarray:
+        embeddings = self.store._embed(queries, cache=False)
+        if self.cache is not None:
+            for q, emb in zip(queries, embeddings):
+                self.cache.set(self._key(q), emb)
+        return embeddings
+
+    # ---------------------------------------------------------
+    # Worker
+    # ---------------------------------------------------------
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._loop, name="rag-query-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[_Request]:
+        """Block for one request, then gather more for up to max_wait."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                self._run(batch)
+            except Exception as err:
+                LOGGER.error(f"Query batch of {len(batch)} failed: {err}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(err)
+
+    def _run(self, batch: List[_Request]) -> None:
+        self.batches += 1
+        self.batched_queries += len(batch)
+
+        # One encode() for every query that isn't cached yet
+        missing = list(dict.fromkeys(r.query for r in batch if r.embedding is None))
+        if missing:
+            fresh = dict(zip(missing, self._embed_and_cache(missing)))
+            for request in batch:
+                if request.embedding is None:
+                    request.embedding = fresh[request.query]
+
+        # One search() per distinct set of ANN knobs (normally just one)
+        groups: Dict[Tuple, List[_Request]] = {}
+        for request in batch:
+            groups.setdefault((request.nprobe, request.ef_search), []).append(request)
+
+        for (nprobe, ef_search), requests in groups.items():
+            top_k = max(r.top_k for r in requests)
+            q_emb = np.stack([r.embedding for r in requests])
+            results = self.store.search_ids(
+                q_emb, top_k, nprobe=nprobe, ef_search=ef_search
+            )
+            for request, hits in zip(requests, results):
+                request.future.set_result(hits[: request.top_k])
@@ -1,35 +1,391 @@
-"""RAG Pipeline — loads → chunks → embeds → indexes → retrieves"""
+"""RAG Pipeline — loads → chunks → embeds → indexes → retrieves
+
+The index is persisted under RAG_INDEX_DIR (default "rag_index") and
+memory-mapped back on startup, so restarts don't re-embed anything.
+Writers take a file lock and reload the on-disk index first, so several
+gunicorn workers can ingest into the same directory; readers pick up
+other workers' changes within RAG_RELOAD_INTERVAL seconds.
+
+Documents and chunks already in the index (exact copies, or near-duplicate
+chunks) are skipped before embedding; see src.rag.dedup.
+
+A multi-file add_documents() parses up to RAG_PARSE_WORKERS files in the
+background while earlier files are being embedded and indexed; each
+parser runs at most _PARSE_AHEAD batches ahead, so memory stays bounded.
+"""
 
 from __future__ import annotations
-from typing import List
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+from src.rag.chunker import Chunker, model_token_counter
+from src.rag.dedup import DEDUP_FILE, RAG_DEDUP, DedupIndex, file_digest
 from src.rag.loader import DocumentLoader
-from src.rag.vectorstore import VectorStore
+from src.rag.vectorstore import MANIFEST_FILE, VectorStore
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "rag_index")
+RAG_AUTOSAVE = os.getenv("RAG_AUTOSAVE", "true").lower() in ("1", "true", "yes")
+RAG_RELOAD_INTERVAL = float(os.getenv("RAG_RELOAD_INTERVAL", "5"))
+# Chunks embedded + indexed per step while a document streams in
+RAG_INGEST_BATCH = int(os.getenv("RAG_INGEST_BATCH", "256"))
+# Files of one add_documents() call parsed concurrently
+RAG_PARSE_WORKERS = int(os.getenv("RAG_PARSE_WORKERS", "2"))
+
+# Chunk batches a background parser may hold before waiting for the writer
+_PARSE_AHEAD = 2
+
+Batch = List[Tuple[str, Dict]]
+
+
+class _BackgroundParse:
+    """Chunk batches of one document, produced in a parser thread."""
+
+    _DONE = object()
+
+    def __init__(self, batches: Iterator[Batch]) -> None:
+        self._batches = batches
+        self._queue: "queue.Queue" = queue.Queue(maxsize=_PARSE_AHEAD)
+        self._cancelled = threading.Event()
+
+    def run(self) -> None:
+        try:
+            if self._cancelled.is_set():
+                return
+            for batch in self._batches:
+                if not self._put(batch):
+                    return
+            self._put(self._DONE)
+        except Exception as err:
+            self._put(err)
+        finally:
+            self._batches.close()
+
+    def _put(self, item) -> bool:
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def __iter__(self) -> Iterator[Batch]:
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                # A cancelled parser may never put anything again
+                if self._cancelled.is_set():
+                    return
+                continue
+            if item is self._DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
 
 
 class RAGPipeline:
     """Full RAG pipeline wrapper."""
 
-    def __init__(self) -> None:
-        self.loader = DocumentLoader()
+    def __init__(self, index_dir: Optional[str] = None) -> None:
+        """Create the pipeline.
+
+        Args:
+        ----
+            index_dir: Persistence directory; defaults to RAG_INDEX_DIR,
+                "" keeps the index in memory only.
+
+        """
         self.vectorstore = VectorStore()
+        # Chunk sizes are measured with the embedding model's tokenizer
+        self.loader = DocumentLoader(
+            Chunker(token_counter=model_token_counter(self.vectorstore.model))
+        )
         self.ready = False
+        self.index_dir = RAG_INDEX_DIR if index_dir is None else index_dir
+        # Serializes writers (background ingestion jobs) on the shared index
+        self._write_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
 
-    def add_documents(self, paths: List[str]) -> None:
-        all_chunks = []
+        self._loaded_mtime: Optional[int] = None
+        self._last_check = 0.0
+        self._dirty = False
+        # Bumped whenever the indexed content changes (here or on reload)
+        self.corpus_version = 0
 
-        for p in paths:
-            chunks = self.loader.load(p)
-            all_chunks.extend(chunks)
+        # Seen document/chunk hashes, kept next to the index they describe
+        self.dedup: Optional[DedupIndex] = None
+        if RAG_DEDUP:
+            if self.index_dir:
+                os.makedirs(self.index_dir, exist_ok=True)
+                self.dedup = DedupIndex(os.path.join(self.index_dir, DEDUP_FILE))
+            else:
+                self.dedup = DedupIndex()
 
-        if not all_chunks:
-            self.ready = False
+        if self.index_dir:
+            self.refresh(force=True)
+
+    # ---------------------------------------------------------
+    # Persistence
+    # ---------------------------------------------------------
+    def _manifest_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.index_dir, MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload the on-disk index if another process saved a newer one."""
+        if not self.index_dir or self._dirty:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_check < RAG_RELOAD_INTERVAL:
             return
 
-        self.vectorstore.build(all_chunks)
-        self.ready = True
+        # Readers skip the check if another thread is already reloading
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_check = now
 
-    def query(self, question: str, top_k: int = 5) -> List[str]:
+            mtime = self._manifest_mtime()
+            if mtime is None or mtime == self._loaded_mtime:
+                return
+
+            if self.vectorstore.load(self.index_dir):
+                self._loaded_mtime = mtime
+                self.ready = len(self.vectorstore) > 0
+                self.corpus_version += 1
+        finally:
+            self._refresh_lock.release()
+
+    def save(self) -> None:
+        """Write the index to index_dir."""
+        if not self.index_dir:
+            return
+        self.vectorstore.save(self.index_dir)
+        self._loaded_mtime = self._manifest_mtime()
+        self._dirty = False
+
+    def _rollback(self) -> None:
+        """Undo a failed write's partial changes.
+
+        Reloads the saved index when memory matched it before the write;
+        otherwise (in-memory pipeline, unsaved earlier writes) the partial
+        state stays, but the corpus version still changes so caches keyed
+        on it don't keep serving answers from before the write.
+        """
+        if self.index_dir and not self._dirty:
+            try:
+                if not self.vectorstore.load(self.index_dir):
+                    self.vectorstore.reset()
+                self._loaded_mtime = self._manifest_mtime()
+            except Exception as err:
+                LOGGER.error(f"Reloading {self.index_dir} after a failed write: {err}")
+                self._dirty = True
+        else:
+            self._dirty = True
+        self.corpus_version += 1
+        self.ready = len(self.vectorstore) > 0
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Exclusive write section: thread lock + cross-process file lock,
+        starting from the latest saved index and saving on exit. A write
+        that raises is rolled back (see _rollback()).
+        """
+        with self._write_lock:
+            lock_file = None
+            if self.index_dir and fcntl is not None:
+                os.makedirs(self.index_dir, exist_ok=True)
+                lock_file = open(os.path.join(self.index_dir, ".lock"), "w")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                self.refresh(force=True)
+                try:
+                    yield
+                except BaseException:
+                    self._rollback()
+                    raise
+                self._dirty = True
+                self.corpus_version += 1
+                self.ready = len(self.vectorstore) > 0
+                if RAG_AUTOSAVE:
+                    self.save()
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    # ---------------------------------------------------------
+    # Ingestion
+    # ---------------------------------------------------------
+    def add_documents(
+        self,
+        paths: List[str],
+        digests: Optional[Dict[str, str]] = None,
+        doc_ids: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """Load, chunk and append paths to the index.
+
+        Each path is its own document (doc id = the path unless doc_ids
+        names another); re-adding a doc id replaces its previous chunks.
+        Chunks are embedded and added in batches of RAG_INGEST_BATCH as
+        the loader streams them, so only a few batches are held in memory.
+        Files whose content is already indexed are skipped, as are
+        duplicate chunks.
+
+        Args:
+        ----
+            paths: Files to ingest, indexed in this order.
+            digests: Known sha256 per path (e.g. hashed during upload);
+                missing ones are computed.
+            doc_ids: Document id per path, e.g. a stable name for a file
+                stored under a versioned path, so a new version replaces
+                the old one.
+
+        Returns:
+        -------
+            Number of chunks added.
+
+        """
+        digests = digests or {}
+        doc_ids = doc_ids or {}
+        added = 0
+
+        workers = max(1, min(RAG_PARSE_WORKERS, len(paths)))
+        with ThreadPoolExecutor(workers, thread_name_prefix="parse") as pool:
+            jobs = []
+            claimed: Set[str] = set()
+            for p in paths:
+                digest = digests.get(p)
+                if self.dedup and digest is None:
+                    digest = file_digest(p)
+                doc_id = doc_ids.get(p, p)
+                # Don't spend a parser on content that is already indexed,
+                # or that an earlier file of this call will index
+                parse = None
+                if not self.dedup or (
+                    digest not in claimed and not self.dedup.document_owner(digest)
+                ):
+                    parse = _BackgroundParse(self._chunk_batches(p, doc_id))
+                    pool.submit(parse.run)
+                    claimed.add(digest)
+                jobs.append((p, doc_id, digest, parse))
+
+            try:
+                for p, doc_id, digest, parse in jobs:
+                    added += self._ingest(p, doc_id, digest, parse)
+            finally:
+                for _, _, _, parse in jobs:
+                    if parse is not None:
+                        parse.cancel()
+
+        return added
+
+    def _chunk_batches(self, path: str, doc_id: str) -> Iterator[Batch]:
+        batch: Batch = []
+        for i, (text, meta) in enumerate(self.loader.iter_chunks(path)):
+            batch.append((text, {"source": doc_id, "chunk": i, **meta}))
+            if len(batch) >= RAG_INGEST_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _ingest(
+        self,
+        path: str,
+        doc_id: str,
+        digest: Optional[str],
+        parse: Optional[_BackgroundParse],
+    ) -> int:
+        """Index one document's batches under the write lock."""
+        added = 0
+        with self._writing():
+            if self.dedup:
+                # Hashes of documents dropped from the index don't count
+                self.dedup.retain(self.vectorstore.doc_ids)
+                owner = self.dedup.document_owner(digest)
+                if owner is not None:
+                    self.dedup.skipped_documents += 1
+                    LOGGER.info(f"Skipping {path}: same content as {owner}")
+                    # Free its pool worker for the files after it
+                    if parse is not None:
+                        parse.cancel()
+                    return 0
+                self.dedup.forget(doc_id)
+            self.vectorstore.delete(doc_id)
+
+            if parse is None:
+                parse = self._chunk_batches(path, doc_id)
+            try:
+                for batch in parse:
+                    texts = [text for text, _ in batch]
+                    metas = [meta for _, meta in batch]
+                    added += self._add_batch(doc_id, texts, metas)
+            except BaseException:
+                # Hashes of the partial document must not block a retry
+                if self.dedup:
+                    self.dedup.forget(doc_id)
+                raise
+            if self.dedup:
+                # Indexed even if every chunk was a duplicate: keeps retain()
+                # from forgetting the document hash
+                self.vectorstore.add([], doc_id=doc_id)
+                self.dedup.add_document(digest, doc_id)
+        return added
+
+    def _add_batch(self, doc_id: str, texts: List[str], metas: List[Dict]) -> int:
+        if self.dedup:
+            keep = self.dedup.filter_chunks(doc_id, texts)
+            texts = [t for t, k in zip(texts, keep) if k]
+            metas = [m for m, k in zip(metas, keep) if k]
+        self.vectorstore.add(texts, doc_id=doc_id, metadatas=metas)
+        return len(texts)
+
+    def delete_document(self, doc_id: str) -> int:
+        """Remove a document from the index; returns chunks removed."""
+        with self._writing():
+            removed = self.vectorstore.delete(doc_id)
+            if self.dedup:
+                self.dedup.forget(doc_id)
+        return removed
+
+    def search(
+        self,
+        question: str,
+        top_k: int = 5,
+        min_score: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[Tuple[str, float, Dict]]:
+        """Relevant (chunk, score, metadata) hits; see VectorStore.search()."""
+        self.refresh()
         if not self.ready:
             return []
-        return self.vectorstore.query(question, top_k)
+        return self.vectorstore.search(
+            question, top_k, min_score=min_score, max_tokens=max_tokens
+        )
+
+    def query(self, question: str, top_k: int = 5) -> List[str]:
+        return [text for text, _, _ in self.search(question, top_k)]
@@ -1,45 +1,551 @@
 """Module: vectorstore
 
-FAISS-based vector store using SentenceTransformer embeddings.
+FAISS-based vector store using SentenceTransformer-compatible embeddings
+(torch, int8 or ONNX backend, see src.rag.embedding_backends).
+
+Every index is addressed by explicit ids (IndexIDMap for flat / HNSW,
+native ids for IVF), so new chunks are embedded and appended without
+touching what is already indexed, and whole documents can be
+removed by id. Chunk text and metadata are kept keyed by the same ids.
+
+save()/load() persist the store to a directory: the FAISS index via
+faiss.write_index, chunk text + metadata via src.rag.chunk_store. load()
+memory-maps both, so restarts skip re-embedding and gunicorn workers
+share the pages; the index is copied into RAM only when first modified.
+
+Index types (RAG_INDEX_TYPE):
+- "flat"  : exact search (default)
+- "ivf"   : IVF-Flat, trained k-means coarse quantizer
+- "hnsw"  : HNSW graph (deletes are tombstoned, compacted periodically)
+- "ivfpq" : IVF with product-quantized codes (smallest memory)
+Non-flat stores start flat and switch to the ANN index automatically once
+RAG_ANN_MIN_VECTORS vectors exist. nprobe / efSearch can be set per query.
+
+Metric (RAG_METRIC): "cosine" (default) L2-normalizes embeddings and
+searches by inner product, so scores are cosine similarities; "l2" keeps
+raw Euclidean distance (score = -distance). Stores saved before metrics
+existed load as "l2". search() returns (chunk, score, metadata) and can
+drop hits below a minimum score or past a token budget.
 """
 
 from __future__ import annotations
 
-from typing import List
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import faiss
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from src.rag.chunk_store import MappedChunks, write_chunk_files
+from src.rag.embedding_backends import LazyEmbedder
+from src.rag.embedding_service import EmbeddingService
+from src.rag.query_batcher import QueryBatcher
+from src.utils.tokens import count_tokens
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.json"
+MANIFEST_FILE = "manifest.json"
+
+# Map flat / HNSW vectors (MMAP_IFC, faiss >= 1.10) or IVF inverted lists
+# (MMAP); the two flags can't be combined for IVF indexes
+MMAP_FLAGS = {
+    "ivf": faiss.IO_FLAG_MMAP,
+    "ivfpq": faiss.IO_FLAG_MMAP,
+}
+DEFAULT_MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+METRICS = {"cosine": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat").lower()
+RAG_ANN_MIN_VECTORS = int(os.getenv("RAG_ANN_MIN_VECTORS", "10000"))
+RAG_NPROBE = int(os.getenv("RAG_NPROBE", "8"))
+RAG_EF_SEARCH = int(os.getenv("RAG_EF_SEARCH", "64"))
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "48"))
+
+RAG_METRIC = os.getenv("RAG_METRIC", "cosine").lower()
+# Cosine hits below this are treated as irrelevant ("" disables)
+RAG_MIN_SCORE = os.getenv("RAG_MIN_SCORE", "0.3")
+
+# HNSW can't remove vectors: rebuild once this share of them is tombstoned
+_TOMBSTONE_COMPACT_RATIO = 0.2
+
+
+def _to_ranges(ids: List[int]) -> List[List[int]]:
+    """Compress sorted ids into [start, end) ranges for docs.json."""
+    ranges: List[List[int]] = []
+    for faiss_id in sorted(ids):
+        if ranges and ranges[-1][1] == faiss_id:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([faiss_id, faiss_id + 1])
+    return ranges
+
+
+def _from_ranges(ranges: List[List[int]]) -> List[int]:
+    return [i for start, end in ranges for i in range(start, end)]
 
 
 class VectorStore:
     """Stores embeddings + FAISS index and performs similarity search."""
 
-    def __init__(self, embed_model: str = "all-MiniLM-L6-v2") -> None:
-        self.model = SentenceTransformer(embed_model)
+    def __init__(
+        self,
+        embed_model: str = "all-MiniLM-L6-v2",
+        index_type: Optional[str] = None,
+        metric: Optional[str] = None,
+    ) -> None:
+        self.embed_model = embed_model
+        # torch, int8 or ONNX encoder, loaded on first use (see
+        # src.rag.embedding_backends)
+        self.model = LazyEmbedder(embed_model)
+        # Batched, cached chunk embedding (see src.rag.embedding_service)
+        self.embedder = EmbeddingService(self.model, embed_model)
+        # Cached, micro-batched query embedding + search
+        self.queries = QueryBatcher(self)
         self.index = None
-        self.text_chunks: List[str] = []
+
+        self.index_type = (index_type or RAG_INDEX_TYPE).lower()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {self.index_type}")
+        self._default_metric = (metric or RAG_METRIC).lower()
+        if self._default_metric not in METRICS:
+            raise ValueError(f"Unknown metric: {self._default_metric}")
+        # Metric of the current index (a loaded store keeps its own)
+        self.metric = self._default_metric
+        # Current physical layout: "flat" until the ANN index is trained
+        self.active_type = "flat"
+        # HNSW deletions (ids still in the graph but no longer live)
+        self._tombstones: set = set()
+
+        # FAISS id -> chunk text / metadata, doc id -> FAISS ids
+        self.chunks: Dict[int, str] = {}
+        self.metadata: Dict[int, Dict] = {}
+        self.doc_ids: Dict[str, List[int]] = {}
+        self._next_id = 0
+
+        # Chunks loaded from disk (mmap) and the ones deleted since loading
+        self._mapped: Optional[MappedChunks] = None
+        self._mapped_deleted: set = set()
+        self._index_path: Optional[str] = None
+        self._index_mmapped = False
+
+        # Guards index + id maps; FAISS adds/removes must not race searches
+        self._lock = threading.RLock()
+
+    # ---------------------------------------------------------
+    # Chunk lookup (in-memory first, then the mmap'd files)
+    # ---------------------------------------------------------
+    def _live_ids(self) -> Iterator[int]:
+        if self._mapped is not None:
+            for faiss_id in self._mapped.iter_ids():
+                if faiss_id not in self._mapped_deleted:
+                    yield faiss_id
+        yield from sorted(self.chunks)
+
+    def _text(self, faiss_id: int) -> Optional[str]:
+        text = self.chunks.get(faiss_id)
+        if text is None and self._mapped is not None:
+            if faiss_id not in self._mapped_deleted:
+                text = self._mapped.text(faiss_id)
+        return text
+
+    def _meta(self, faiss_id: int) -> Dict:
+        meta = self.metadata.get(faiss_id)
+        if meta is None and self._mapped is not None:
+            meta = self._mapped.meta(faiss_id)
+        return meta or {}
+
+    @property
+    def text_chunks(self) -> List[str]:
+        """All indexed chunk texts, in insertion order."""
+        with self._lock:
+            return [self._text(i) for i in self._live_ids()]
+
+    def __len__(self) -> int:
+        mapped = len(self._mapped) - len(self._mapped_deleted) if self._mapped else 0
+        return mapped + len(self.chunks)
+
+    def _embed(self, texts: List[str], cache: bool = True) -> np.ndarray:
+        emb = np.ascontiguousarray(self.embedder.encode(texts, cache=cache))
+        if self.metric == "cosine":
+            faiss.normalize_L2(emb)
+        return emb
+
+    def _new_flat_index(self, dim: int) -> "faiss.Index":
+        return faiss.IndexIDMap(faiss.index_factory(dim, "Flat", METRICS[self.metric]))
+
+    def _ensure_writable(self) -> None:
+        """Swap an mmap'd index for an in-RAM copy before mutating it.
+
+        Adding to or removing from a mapped FAISS index aborts the process.
+        """
+        if self._index_mmapped:
+            self.index = faiss.read_index(self._index_path)
+            self._index_mmapped = False
+
+    # ---------------------------------------------------------
+    # ANN index management
+    # ---------------------------------------------------------
+    @staticmethod
+    def _factory_string(index_type: str, n: int, dim: int) -> str:
+        """faiss.index_factory description for index_type at n vectors."""
+        if index_type == "flat":
+            return "Flat"
+        if index_type == "hnsw":
+            return f"HNSW{RAG_HNSW_M}"
+
+        # ~sqrt(n) lists, but at least 39 training points per centroid
+        nlist = max(1, min(int(math.sqrt(n)), n // 39))
+        if index_type == "ivf":
+            return f"IVF{nlist},Flat"
+
+        # PQ sub-quantizers must divide the dimension
+        pq_m = max(m for m in range(1, min(RAG_PQ_M, dim) + 1) if dim % m == 0)
+        return f"IVF{nlist},PQ{pq_m}"
+
+    def _export_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All (vectors, ids) currently stored in a flat or HNSW index."""
+        inner = faiss.downcast_index(self.index.index)
+        vectors = inner.reconstruct_n(0, inner.ntotal)
+        ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+        return vectors, ids
+
+    def _rebuild(self, index_type: str) -> None:
+        """Re-create the index as index_type, dropping tombstoned vectors.
+
+        Runs under the store lock; training k-means on RAG_ANN_MIN_VECTORS+
+        vectors blocks searches for a few seconds, once per migration.
+        """
+        vectors, ids = self._export_vectors()
+        if self._tombstones:
+            keep = ~np.isin(ids, np.fromiter(self._tombstones, dtype="int64"))
+            vectors, ids = vectors[keep], ids[keep]
+
+        spec = self._factory_string(index_type, len(ids), vectors.shape[1])
+        base = faiss.index_factory(vectors.shape[1], spec, METRICS[self.metric])
+        if not base.is_trained:
+            base.train(vectors)
+
+        # IVF stores ids itself (and IndexIDMap's remove_ids would break it:
+        # IVF doesn't renumber); flat / HNSW need the IndexIDMap wrapper
+        index = base if index_type in ("ivf", "ivfpq") else faiss.IndexIDMap(base)
+        index.add_with_ids(vectors, ids)
+
+        self.index = index
+        self.active_type = index_type
+        self._tombstones = set()
+        LOGGER.info(f"Rebuilt vector index as {spec} ({len(ids)} vectors)")
+
+    def _maybe_migrate(self) -> None:
+        """Switch a flat index to index_type once it is large enough."""
+        if self.index_type == "flat" or self.active_type != "flat":
+            return
+        if self.index.ntotal >= RAG_ANN_MIN_VECTORS:
+            self._rebuild(self.index_type)
+
+    def _search_params(
+        self, nprobe: Optional[int], ef_search: Optional[int]
+    ) -> Optional["faiss.SearchParameters"]:
+        if self.active_type in ("ivf", "ivfpq"):
+            return faiss.SearchParametersIVF(nprobe=nprobe or RAG_NPROBE)
+        if self.active_type == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or RAG_EF_SEARCH)
+        return None
+
+    # ---------------------------------------------------------
+    # Mutation
+    # ---------------------------------------------------------
+    def add(
+        self,
+        chunks: List[str],
+        doc_id: Optional[str] = None,
+        metadatas: Optional[List[Dict]] = None,
+    ) -> List[int]:
+        """Embed only the new chunks and append them to the index.
+
+        Args:
+        ----
+            chunks: Chunk texts to add. May be empty: doc_id is still
+                recorded (e.g. a document whose chunks were all duplicates).
+            doc_id: Document the chunks belong to (enables delete()).
+            metadatas: Optional per-chunk metadata, aligned with chunks.
+
+        Returns:
+        -------
+            The FAISS ids assigned to the chunks.
+
+        """
+        if not chunks:
+            if doc_id is not None:
+                with self._lock:
+                    self.doc_ids.setdefault(doc_id, [])
+            return []
+
+        # Embedding is the expensive part: do it outside the lock
+        embeddings = self._embed(chunks)
+
+        with self._lock:
+            if self.index is None:
+                self.index = self._new_flat_index(embeddings.shape[1])
+            self._ensure_writable()
+
+            ids = list(range(self._next_id, self._next_id + len(chunks)))
+            self._next_id += len(chunks)
+
+            self.index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+
+            for i, (faiss_id, text) in enumerate(zip(ids, chunks)):
+                meta = dict(metadatas[i]) if metadatas else {}
+                if doc_id is not None:
+                    meta["doc_id"] = doc_id
+                self.chunks[faiss_id] = text
+                self.metadata[faiss_id] = meta
+
+            if doc_id is not None:
+                self.doc_ids.setdefault(doc_id, []).extend(ids)
+
+            self._maybe_migrate()
+
+        return ids
+
+    def delete(self, doc_id: str) -> int:
+        """Remove every chunk of a document; returns how many were removed."""
+        with self._lock:
+            ids = self.doc_ids.pop(doc_id, [])
+            if not ids or self.index is None:
+                return 0
+
+            self._ensure_writable()
+            if self.active_type == "hnsw":
+                # HNSW graphs don't support removal: hide the ids instead
+                self._tombstones.update(ids)
+                if len(self._tombstones) > _TOMBSTONE_COMPACT_RATIO * self.index.ntotal:
+                    self._rebuild("hnsw")
+            else:
+                self.index.remove_ids(np.asarray(ids, dtype="int64"))
+            for faiss_id in ids:
+                if self.chunks.pop(faiss_id, None) is None:
+                    self._mapped_deleted.add(faiss_id)
+                self.metadata.pop(faiss_id, None)
+
+        return len(ids)
+
+    def reset(self) -> None:
+        """Drop the index and every chunk."""
+        with self._lock:
+            self.index = None
+            self.chunks = {}
+            self.metadata = {}
+            self.doc_ids = {}
+            self._next_id = 0
+            self._mapped = None
+            self._mapped_deleted = set()
+            self._index_path = None
+            self._index_mmapped = False
+            self.active_type = "flat"
+            self._tombstones = set()
+            self.metric = self._default_metric
 
     def build(self, chunks: List[str]) -> None:
-        """Build FAISS index from text chunks."""
-        self.text_chunks = chunks
+        """Build FAISS index from text chunks (replaces existing content)."""
+        self.reset()
+        self.add(chunks)
+
+    # ---------------------------------------------------------
+    # Persistence
+    # ---------------------------------------------------------
+    def save(self, directory: str) -> None:
+        """Persist index, chunks, metadata and doc map into directory."""
+        with self._lock:
+            if self.index is None:
+                return
+
+            os.makedirs(directory, exist_ok=True)
+            index_path = os.path.join(directory, INDEX_FILE)
+
+            faiss.write_index(self.index, index_path + ".tmp")
+            os.replace(index_path + ".tmp", index_path)
+
+            rows: Iterator[Tuple[int, str, Dict]] = (
+                (i, self._text(i), self._meta(i)) for i in self._live_ids()
+            )
+            count = write_chunk_files(directory, rows)
 
-        embeddings = self.model.encode(chunks, convert_to_numpy=True)
-        dim = embeddings.shape[1]
+            docs = {doc: _to_ranges(ids) for doc, ids in self.doc_ids.items()}
+            manifest = {
+                "version": 1,
+                "embed_model": self.embed_model,
+                "next_id": self._next_id,
+                "count": count,
+                "index_type": self.active_type,
+                "metric": self.metric,
+                "tombstones": sorted(self._tombstones),
+            }
 
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(embeddings)
+            for name, payload in ((DOCS_FILE, docs), (MANIFEST_FILE, manifest)):
+                path = os.path.join(directory, name)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(payload, f)
+                os.replace(path + ".tmp", path)
 
-    def query(self, query: str, top_k: int = 5) -> List[str]:
-        """Return top-k matching text chunks."""
+        LOGGER.info(f"Saved vector store ({count} chunks) to {directory}")
+
+    def load(self, directory: str, mmap: bool = True) -> bool:
+        """Load a store written by save(); returns False if none exists.
+
+        With mmap=True the FAISS index and the chunk files are memory-mapped
+        instead of read into RAM.
+        """
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return False
+
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(directory, DOCS_FILE), encoding="utf-8") as f:
+            docs = json.load(f)
+
+        if manifest.get("embed_model") != self.embed_model:
+            LOGGER.warning(
+                f"Index in {directory} was built with {manifest.get('embed_model')}, "
+                f"not {self.embed_model}; ignoring it"
+            )
+            return False
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        active_type = manifest.get("index_type", "flat")
+        metric = manifest.get("metric", "l2")
+        if metric != self._default_metric:
+            LOGGER.warning(
+                f"Index in {directory} uses the {metric} metric, "
+                f"not {self._default_metric}; "
+                f"keeping {metric} until it is rebuilt"
+            )
+        flags = MMAP_FLAGS.get(active_type, DEFAULT_MMAP_FLAGS) if mmap else 0
+        index = faiss.read_index(index_path, flags)
+        mapped = MappedChunks(directory)
+
+        with self._lock:
+            self.reset()
+            self.index = index
+            self._index_path = index_path
+            self._index_mmapped = mmap
+            self._mapped = mapped
+            self._next_id = manifest["next_id"]
+            self.active_type = active_type
+            self.metric = metric
+            self._tombstones = set(manifest.get("tombstones", []))
+            self.doc_ids = {doc: _from_ranges(r) for doc, r in docs.items()}
+
+        LOGGER.info(f"Loaded vector store ({len(self)} chunks) from {directory}")
+        return True
+
+    # ---------------------------------------------------------
+    # Search
+    # ---------------------------------------------------------
+    def search_ids(
+        self,
+        q_emb: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Search a batch of query embeddings; (id, score) lists per query.
+
+        Scores are similarities (higher is better): cosine similarity for
+        the cosine metric, negative distance for l2.
+
+        Args:
+        ----
+            q_emb: float32 array of shape (n_queries, dim), from _embed().
+            top_k: Results per query.
+            nprobe: IVF lists to visit (default RAG_NPROBE).
+            ef_search: HNSW candidate list size (default RAG_EF_SEARCH).
+
+        """
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in range(len(q_emb))]
+
+            # Over-fetch so tombstoned hits don't shrink the result list
+            k = top_k + min(len(self._tombstones), 3 * top_k)
+            params = self._search_params(nprobe, ef_search)
+            distances, indices = self.index.search(q_emb, k, params=params)
+            sign = 1.0 if self.metric == "cosine" else -1.0
+
+            results = []
+            for row_d, row_i in zip(distances, indices):
+                hits = [
+                    (int(i), sign * float(d))
+                    for d, i in zip(row_d, row_i)
+                    if i >= 0 and int(i) not in self._tombstones
+                ]
+                results.append(hits[:top_k])
+        return results
+
+    def _default_min_score(self) -> Optional[float]:
+        # The cutoff is a cosine similarity: meaningless for raw L2 scores
+        if self.metric != "cosine" or not RAG_MIN_SCORE:
+            return None
+        return float(RAG_MIN_SCORE)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        min_score: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Tuple[str, float, Dict]]:
+        """Return up to top_k (chunk, score, metadata) hits, best first.
+
+        Args:
+        ----
+            query: Query text.
+            top_k: Maximum number of hits.
+            min_score: Drop hits scoring below this (default RAG_MIN_SCORE
+                for cosine stores, no cutoff for l2).
+            max_tokens: Stop adding hits once their chunks would exceed
+                this many tokens (a hit that doesn't fit is skipped).
+            nprobe / ef_search: ANN search knobs, see search_ids().
+
+        """
         if self.index is None:
             return []
 
-        q_emb = self.model.encode([query], convert_to_numpy=True)
-        distances, indices = self.index.search(q_emb, top_k)
+        if min_score is None:
+            min_score = self._default_min_score()
 
-        results = []
-        for idx in indices[0]:
-            if 0 <= idx < len(self.text_chunks):
-                results.append(self.text_chunks[idx])
+        hits = self.queries.search(query, top_k, nprobe=nprobe, ef_search=ef_search)
+
+        results: List[Tuple[str, float, Dict]] = []
+        used = 0
+        with self._lock:
+            for idx, score in hits:
+                if min_score is not None and score < min_score:
+                    break
+                text = self._text(idx)
+                if text is None:
+                    continue
+                if max_tokens is not None:
+                    cost = count_tokens(text)
+                    if used + cost > max_tokens:
+                        continue
+                    used += cost
+                results.append((text, score, self._meta(idx)))
 
         return results
+
+    def query(self, query: str, top_k: int = 5, **kwargs) -> List[str]:
+        """Return the text of the top-k hits (see search() for kwargs)."""
+        return [text for text, _, _ in self.search(query, top_k, **kwargs)]
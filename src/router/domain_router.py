@@ -3,15 +3,32 @@ Stable Domain Router (NEVER returns invalid output)
 
 This router safely classifies queries into domains using an LLM.
 It ALWAYS returns a valid dictionary and NEVER throws a 500 error.
+
+Modes (ROUTER_MODE env or `mode=`):
+- "llm"   : every query is classified by the LLM (default)
+- "local" : classify with the local embedding model first and escalate
+            to the LLM only when confidence < ROUTER_LOCAL_THRESHOLD.
+            Local decisions carry "source": "local"; their softmax
+            confidence is judged against ROUTER_LOCAL_REJECT_CONFIDENCE
+            (default 0.9) instead of the LLM's 0.75 when the router
+            overrules a selected domain (MultiDomainAssistant._decide).
+
+Decisions are cached (ROUTER_CACHE_SIZE / ROUTER_CACHE_TTL); set
+ROUTER_CACHE_SIMILARITY to also reuse decisions for similar queries.
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import os
+import threading
 from typing import Dict, List, Optional
 
 from src.models.llm import LLM
+from src.router.local_classifier import EmbeddingDomainClassifier
+from src.router.route_cache import RouteCache
 
 
 LOGGER = logging.getLogger(__name__)
@@ -26,6 +43,10 @@ class DomainRouter:
         domains: Optional[List[str]] = None,
         llm: Optional[LLM] = None,
         system_instruction: str | None = None,
+        mode: str | None = None,
+        embedder: Optional[object] = None,
+        local_threshold: float | None = None,
+        cache: Optional[RouteCache] = None,
     ) -> None:
 
         self.domains = domains or [
@@ -44,6 +65,43 @@ class DomainRouter:
             "Never include anything outside the JSON."
         )
 
+        # Local (embedding) routing — needs an encoder, e.g. the RAG
+        # pipeline's SentenceTransformer, otherwise we stay in LLM mode.
+        self.mode = (mode or os.getenv("ROUTER_MODE", "llm")).lower()
+        self.local_threshold = (
+            local_threshold
+            if local_threshold is not None
+            else float(os.getenv("ROUTER_LOCAL_THRESHOLD", "0.6"))
+        )
+        self.classifier = (
+            EmbeddingDomainClassifier(embedder) if embedder is not None else None
+        )
+        if self.mode == "local" and self.classifier is None:
+            LOGGER.warning("ROUTER_MODE=local but no embedder given; using LLM mode")
+            self.mode = "llm"
+
+        self._stats = {"local": 0, "escalated": 0, "llm": 0}
+        self._stats_lock = threading.Lock()
+
+        self.cache = cache if cache is not None else self._default_cache(embedder)
+
+    @staticmethod
+    def _default_cache(embedder: Optional[object]) -> Optional[RouteCache]:
+        """Build the decision cache from env; ROUTER_CACHE_SIZE=0 disables it."""
+        size = int(os.getenv("ROUTER_CACHE_SIZE", "2048"))
+        if size <= 0:
+            return None
+
+        ttl = float(os.getenv("ROUTER_CACHE_TTL", "3600"))
+        similarity = os.getenv("ROUTER_CACHE_SIMILARITY")
+
+        return RouteCache(
+            maxsize=size,
+            ttl=ttl if ttl > 0 else None,
+            embedder=embedder,
+            similarity_threshold=float(similarity) if similarity else None,
+        )
+
     # ---------------------------------------------------------
     # Prompt Builder
     # ---------------------------------------------------------
@@ -71,38 +129,142 @@ class DomainRouter:
     # ---------------------------------------------------------
     def route(self, query: str) -> Dict:
         """Classify query into a domain. ALWAYS returns a valid dict."""
-        prompt = self._prompt(query)
+        if self.cache is not None:
+            cached = self.cache.get(query)
+            if cached is not None:
+                return cached
+
+        decision = None
+        if self.mode == "local":
+            decision = self._route_local(query)
+
+        if decision is None:
+            self._count("llm")
+            decision = self._route_llm(query)
+
+        self._remember(query, decision)
+        return decision
+
+    async def aroute(self, query: str) -> Dict:
+        """Async route(). ALWAYS returns a valid dict."""
+        if self.cache is not None:
+            # Semantic lookup embeds the query: keep it off the event loop
+            if self.cache.semantic:
+                cached = await asyncio.to_thread(self.cache.get, query)
+            else:
+                cached = self.cache.get(query)
+            if cached is not None:
+                return cached
+
+        decision = None
+        if self.mode == "local":
+            # Encoding is CPU-bound: keep it off the event loop
+            decision = await asyncio.to_thread(self._route_local, query)
 
+        if decision is None:
+            self._count("llm")
+            decision = await self._aroute_llm(query)
+
+        if self.cache is not None and self.cache.semantic:
+            await asyncio.to_thread(self._remember, query, decision)
+        else:
+            self._remember(query, decision)
+        return decision
+
+    def _remember(self, query: str, decision: Dict) -> None:
+        # Zero confidence means the keyword fallback answered (LLM failed or
+        # returned garbage) — don't let a transient error stick in the cache.
+        if self.cache is not None and decision["confidence"] > 0:
+            self.cache.put(query, decision)
+
+    def _route_local(self, query: str) -> Optional[Dict]:
+        """Embedding classification; None means "escalate to the LLM"."""
         try:
-            raw = self.llm.generate(prompt, max_tokens=120).strip()
+            decision = self.classifier.classify(query)
+        except Exception as err:
+            LOGGER.warning(f"Local router failed, escalating: {err}")
+            self._count("escalated")
+            return None
 
-            # Extract JSON safely
-            start = raw.find("{")
-            end = raw.rfind("}")
+        if decision["confidence"] >= self.local_threshold:
+            self._count("local")
+            return decision
 
-            if start == -1 or end == -1:
-                raise ValueError("No JSON found in LLM output")
+        self._count("escalated")
+        return None
 
-            json_text = raw[start : end + 1]
-            data = json.loads(json_text)
+    def _route_llm(self, query: str) -> Dict:
+        prompt = self._prompt(query)
 
-            domain = str(data.get("domain", "")).lower()
-            confidence = float(data.get("confidence", 0.0))
-            reason = data.get("reason", "LLM output")
+        try:
+            raw = self.llm.generate(prompt, max_tokens=120).strip()
+            return self._parse(raw)
 
-            if domain not in self.domains:
-                raise ValueError(f"Invalid domain: {domain}")
+        except Exception as err:
+            LOGGER.warning(f"Router fallback triggered: {err}")
+            return self._fallback(query)
 
-            return {
-                "domain": domain,
-                "confidence": confidence,
-                "reason": reason,
-            }
+    async def _aroute_llm(self, query: str) -> Dict:
+        prompt = self._prompt(query)
+
+        try:
+            raw = (await self.llm.agenerate(prompt, max_tokens=120)).strip()
+            return self._parse(raw)
 
         except Exception as err:
             LOGGER.warning(f"Router fallback triggered: {err}")
             return self._fallback(query)
 
+    def _parse(self, raw: str) -> Dict:
+        """Extract and validate the JSON decision from raw LLM output."""
+        # Extract JSON safely
+        start = raw.find("{")
+        end = raw.rfind("}")
+
+        if start == -1 or end == -1:
+            raise ValueError("No JSON found in LLM output")
+
+        json_text = raw[start : end + 1]
+        data = json.loads(json_text)
+
+        domain = str(data.get("domain", "")).lower()
+        confidence = float(data.get("confidence", 0.0))
+        reason = data.get("reason", "LLM output")
+
+        if domain not in self.domains:
+            raise ValueError(f"Invalid domain: {domain}")
+
+        return {
+            "domain": domain,
+            "confidence": confidence,
+            "reason": reason,
+        }
+
+    # ---------------------------------------------------------
+    # Metrics
+    # ---------------------------------------------------------
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def metrics(self) -> Dict:
+        """Routing counters.
+
+        ``llm`` counts LLM router calls (escalations included), ``local``
+        counts queries answered by the embedding classifier alone.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        local_attempts = stats["local"] + stats["escalated"]
+        stats["mode"] = self.mode
+        stats["escalation_rate"] = (
+            round(stats["escalated"] / local_attempts, 4) if local_attempts else 0.0
+        )
+        if self.cache is not None:
+            stats["cache"] = self.cache.metrics()
+        return stats
+
     # ---------------------------------------------------------
     # Fallback Logic (Guarantees no crash)
     # ---------------------------------------------------------
@@ -0,0 +1,143 @@
+"""
+Local Domain Classifier (no LLM call)
+
+Nearest-centroid classifier over the SentenceTransformer that the RAG
+pipeline already loads. Each domain is represented by the normalized mean
+embedding of a handful of exemplar queries; a query is scored by cosine
+similarity against every centroid and the similarities are turned into a
+confidence with a temperature softmax.
+
+The softmax is sharp (temperature 0.05): confidences sit near 0 or 1 and
+are not comparable with an LLM's self-reported confidence. Decisions are
+tagged ``"source": "local"`` so callers can apply their own thresholds
+(see ROUTER_LOCAL_THRESHOLD in DomainRouter and
+ROUTER_LOCAL_REJECT_CONFIDENCE in MultiDomainAssistant).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+DOMAIN_EXEMPLARS: Dict[str, List[str]] = {
+    "education": [
+        "Explain how photosynthesis works",
+        "What is the difference between mitosis and meiosis?",
+        "Summarize the causes of World War I",
+        "Teach me the basics of linear algebra",
+        "How does binary search work?",
+        "Explain recursion with an example",
+        "What is Newton's second law?",
+        "Help me understand compound interest",
+    ],
+    "coding": [
+        "Fix this Python error: TypeError: 'NoneType' object is not iterable",
+        "Write a function to reverse a linked list in Java",
+        "Why does my React component re-render infinitely?",
+        "Optimize this SQL query",
+        "How do I read a CSV file with pandas?",
+        "My code throws a segmentation fault in C++",
+        "Convert this loop to a list comprehension",
+        "Debug my JavaScript async/await code",
+    ],
+    "medical": [
+        "What are the symptoms of diabetes?",
+        "How does the immune system fight infections?",
+        "What causes high blood pressure?",
+        "Explain how the heart pumps blood",
+        "What is the difference between a virus and bacteria?",
+        "Why do we get a fever?",
+        "How does the menstrual cycle work?",
+        "What does cholesterol do in the body?",
+    ],
+    "legal": [
+        "What is the difference between civil and criminal law?",
+        "Explain what a breach of contract means",
+        "What are my rights as a tenant?",
+        "What does intellectual property cover?",
+        "How does the court appeal process work?",
+        "What is a non-disclosure agreement?",
+        "Explain the meaning of habeas corpus",
+        "What is IPC section 420 about?",
+    ],
+    "general": [
+        "Hi, how are you?",
+        "Tell me a joke",
+        "What's a good name for a pet cat?",
+        "Recommend a movie for tonight",
+        "Thanks for the help!",
+        "What should I cook for dinner?",
+        "Write a short birthday message for my friend",
+        "Who are you?",
+    ],
+}
+
+
+class EmbeddingDomainClassifier:
+    """Nearest-centroid domain classifier on sentence embeddings."""
+
+    def __init__(
+        self,
+        model,
+        exemplars: Optional[Dict[str, List[str]]] = None,
+        temperature: float = 0.05,
+    ) -> None:
+        """Create the classifier.
+
+        Args:
+        ----
+            model: Embedding model exposing encode(texts, ...) (SentenceTransformer).
+            exemplars: Domain -> example queries. Defaults to DOMAIN_EXEMPLARS.
+            temperature: Softmax temperature applied to cosine similarities;
+                lower values give sharper confidences.
+
+        """
+        self.model = model
+        self.exemplars = exemplars or DOMAIN_EXEMPLARS
+        self.temperature = temperature
+
+        self.domains: List[str] = list(self.exemplars)
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True),
+            dtype="float32",
+        )
+
+    def _fit(self) -> np.ndarray:
+        """Compute (once) one unit-length centroid per domain."""
+        if self._centroids is not None:
+            return self._centroids
+
+        with self._lock:
+            if self._centroids is None:
+                centroids = []
+                for domain in self.domains:
+                    mean = self._encode(self.exemplars[domain]).mean(axis=0)
+                    centroids.append(mean / (np.linalg.norm(mean) or 1.0))
+                self._centroids = np.stack(centroids)
+
+        return self._centroids
+
+    def classify(self, query: str) -> Dict:
+        """Return {domain, confidence, reason, source} (DomainRouter's shape)."""
+        centroids = self._fit()
+        q_emb = self._encode([query])[0]
+
+        sims = centroids @ q_emb
+        logits = (sims - sims.max()) / self.temperature
+        probs = np.exp(logits) / np.exp(logits).sum()
+
+        best = int(np.argmax(probs))
+
+        return {
+            "domain": self.domains[best],
+            "confidence": round(float(probs[best]), 4),
+            "reason": f"embedding similarity {float(sims[best]):.2f}",
+            "source": "local",
+        }
@@ -0,0 +1,142 @@
+"""
+Router Decision Cache
+
+Remembers DomainRouter decisions so repeated ("hi", "explain recursion")
+and near-identical queries skip classification entirely.
+
+Lookup order:
+1. exact match on the normalized query text
+2. (optional) embedding similarity: reuse the decision of the most similar
+   cached query when cosine similarity >= `similarity_threshold`
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.utils.ttl_cache import TTLCache
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return _WS_RE.sub(" ", text.strip().lower()).rstrip(" ?!.")
+
+
+class RouteCache:
+    """LRU + TTL cache of routing decisions with optional semantic lookup."""
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl: Optional[float] = 3600.0,
+        embedder: Optional[object] = None,
+        similarity_threshold: Optional[float] = None,
+    ) -> None:
+        """Create the cache.
+
+        Args:
+        ----
+            maxsize: Maximum cached decisions.
+            ttl: Seconds a decision stays valid (None = forever).
+            embedder: Model exposing encode(); required for semantic lookup.
+            similarity_threshold: Cosine similarity needed to reuse a decision
+                for a different query. None disables semantic lookup.
+
+        """
+        self.semantic = embedder is not None and similarity_threshold is not None
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._on_evict)
+
+        # Semantic index: normalized query -> unit vector, stacked lazily
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._lock = threading.Lock()
+
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    # ---------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------
+    def _on_evict(self, key: str, _value: Dict) -> None:
+        with self._lock:
+            if self._vectors.pop(key, None) is not None:
+                self._matrix = None
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = self.embedder.encode(
+            [text], convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.asarray(vec, dtype="float32")[0]
+
+    def _nearest(self, vec: np.ndarray) -> Optional[str]:
+        with self._lock:
+            if not self._vectors:
+                return None
+            if self._matrix is None:
+                self._matrix_keys = list(self._vectors)
+                self._matrix = np.stack([self._vectors[k] for k in self._matrix_keys])
+            sims = self._matrix @ vec
+            keys = self._matrix_keys
+
+        best = int(np.argmax(sims))
+        if sims[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def get(self, query: str) -> Optional[Dict]:
+        """Return a cached decision for query, or None on a miss."""
+        norm = normalize_query(query)
+
+        decision = self._entries.get(norm)
+        if decision is not None:
+            self._count("exact_hits")
+            return dict(decision)
+
+        if self.semantic:
+            match = self._nearest(self._embed(norm))
+            if match is not None:
+                decision = self._entries.get(match)
+                if decision is not None:
+                    self._count("semantic_hits")
+                    return dict(decision)
+
+        self._count("misses")
+        return None
+
+    def put(self, query: str, decision: Dict) -> None:
+        """Store the decision for query."""
+        norm = normalize_query(query)
+        self._entries.set(norm, dict(decision))
+
+        if self.semantic:
+            vec = self._embed(norm)
+            with self._lock:
+                self._vectors[norm] = vec
+                self._matrix = None
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        stats["size"] = len(self._entries)
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,87 @@
+"""Module: context_budget.
+
+Fits conversation memory, RAG knowledge and the user query into a
+per-domain prompt token budget.
+
+Priority: the query is always kept (truncated only if it alone exceeds
+half the budget), memory gets up to MEMORY_SHARE of what remains (newest
+turns first), and RAG chunks fill the rest in rank order.
+
+Budgets can be overridden per domain with CONTEXT_BUDGET_<DOMAIN>, e.g.
+CONTEXT_BUDGET_CODING=8000.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List, Tuple
+
+from src.utils.tokens import count_tokens, truncate_tokens
+
+DOMAIN_TOKEN_BUDGETS = {
+    "coding": 6000,
+    "education": 3500,
+    "medical": 3000,
+    "legal": 3000,
+    "general": 2000,
+}
+
+# Fraction of the post-query budget that memory may use
+MEMORY_SHARE = 0.4
+
+
+def domain_budget(domain: str) -> int:
+    """Prompt token budget for a domain (env override wins)."""
+    override = os.getenv(f"CONTEXT_BUDGET_{domain.upper()}")
+    if override:
+        return int(override)
+    return DOMAIN_TOKEN_BUDGETS.get(domain, DOMAIN_TOKEN_BUDGETS["general"])
+
+
+def fit_context(
+    budget: int,
+    query: str,
+    memory: List[str],
+    knowledge: List[str],
+    overhead: int = 0,
+) -> Tuple[str, List[str], List[str]]:
+    """Trim query / memory / knowledge so their tokens fit the budget.
+
+    Args:
+    ----
+        budget: Total prompt tokens allowed.
+        query: User query (never dropped).
+        memory: Memory lines, oldest first.
+        knowledge: Retrieved chunks, best first.
+        overhead: Tokens already used by the template's fixed instructions.
+
+    Returns:
+    -------
+        (query, memory, knowledge) that fit, in their original order.
+
+    """
+    remaining = max(budget - overhead, 0)
+
+    query = truncate_tokens(query, max(remaining // 2, 1))
+    remaining -= count_tokens(query)
+
+    memory_budget = int(remaining * MEMORY_SHARE)
+    kept_memory: List[str] = []
+    used = 0
+    for line in reversed(memory):
+        cost = count_tokens(line)
+        if used + cost > memory_budget:
+            break
+        kept_memory.insert(0, line)
+        used += cost
+    remaining -= used
+
+    kept_knowledge: List[str] = []
+    for chunk in knowledge:
+        cost = count_tokens(chunk)
+        if cost > remaining:
+            continue
+        kept_knowledge.append(chunk)
+        remaining -= cost
+
+    return query, kept_memory, kept_knowledge
@@ -2,11 +2,30 @@
 
 Maintains short-term conversation memory and structured context
 for RAG + LLM prompting.
+
+Recent turns are kept verbatim within an entry / token / byte budget.
+Older turns are folded into a running summary instead of being resent
+in full (or silently dropped), so long conversations stay cheap.
 """
 
 from __future__ import annotations
 
-from typing import Dict, List
+import re
+from typing import Dict, List, Optional
+
+from src.utils.tokens import count_tokens, truncate_tokens
+
+# Tokens kept from each folded turn in the running summary
+_FOLDED_TURN_TOKENS = 40
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def _condense(entry: str) -> str:
+    """Compress one memory line to its first sentence, token-capped."""
+    flat = " ".join(entry.split())
+    first = _SENTENCE_END_RE.split(flat, maxsplit=1)[0]
+    return truncate_tokens(first, _FOLDED_TURN_TOKENS)
 
 
 class ContextManager:
@@ -14,27 +33,90 @@ class ContextManager:
     structured context for agents.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        max_entries: int = 12,
+        max_bytes: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summary_tokens: int = 300,
+    ) -> None:
         self.memory: List[str] = []
+        self.summary: str = ""
         self.state: Dict = {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+
+    def _over_budget(self) -> bool:
+        if len(self.memory) > self.max_entries:
+            return True
+        if self.max_tokens is not None:
+            if sum(count_tokens(m) for m in self.memory) > self.max_tokens:
+                return True
+        if self.max_bytes is not None:
+            if sum(len(m.encode("utf-8")) for m in self.memory) > self.max_bytes:
+                return True
+        return False
+
+    def _fold(self, entries: List[str]) -> None:
+        """Merge entries into the running summary, keeping it within budget."""
+        lines = [line for line in self.summary.split("\n") if line]
+        lines.extend(_condense(entry) for entry in entries)
+
+        # Oldest summary lines go first once the summary itself is too big
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+
+        self.summary = truncate_tokens("\n".join(lines), self.summary_tokens)
 
     def add_memory(self, user_msg: str, assistant_msg: str) -> None:
         """Add the latest user + assistant messages to memory."""
         self.memory.append(f"User: {user_msg}")
         self.memory.append(f"Assistant: {assistant_msg}")
 
-        # Keep memory bounded (prevents prompt explosion)
-        if len(self.memory) > 12:
-            self.memory = self.memory[-12:]
+        # Keep memory bounded (prevents prompt explosion): oldest exchanges
+        # are folded into the summary rather than kept verbatim.
+        while self.memory and self._over_budget():
+            self._fold(self.memory[:2])
+            self.memory = self.memory[2:]
 
     def build_context(self) -> Dict:
         """Build structured context dictionary expected by agents."""
+        memory = list(self.memory)
+        if self.summary:
+            memory.insert(0, f"Summary of earlier conversation:\n{self.summary}")
+
         return {
-            "memory": self.memory,
-            "state": self.state,
+            "memory": memory,
+            "summary": self.summary,
+            "state": dict(self.state),
         }
 
     def clear(self) -> None:
         """Reset full memory and state."""
         self.memory = []
+        self.summary = ""
         self.state = {}
+
+    def to_dict(self) -> Dict:
+        """Serializable snapshot (used by session backends)."""
+        return {
+            "memory": list(self.memory),
+            "summary": self.summary,
+            "state": dict(self.state),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict], **limits) -> "ContextManager":
+        """Rebuild a ContextManager from to_dict() output.
+
+        ``limits`` are forwarded to the constructor (max_entries, max_bytes,
+        max_tokens, summary_tokens).
+        """
+        cm = cls(**limits)
+        if data:
+            cm.memory = list(data.get("memory", []))
+            cm.summary = data.get("summary", "")
+            cm.state = dict(data.get("state", {}))
+        return cm
@@ -0,0 +1,212 @@
+"""Module: response_cache.
+
+Whole-answer cache in front of MultiDomainAssistant, so repeated
+FAQ-style questions skip both the router and the agent LLM call.
+
+Entries are partitioned by a scope tuple
+(selected domain, RAG corpus version, prompt template version) and keyed
+inside it by the normalized query, so ingesting documents or editing a
+prompt template never serves a stale answer. Optionally a query whose
+embedding is close enough (RESPONSE_CACHE_SIMILARITY) to a cached query
+of the same scope reuses its answer.
+
+Only first turns are cached: an answer that depended on conversation
+memory is not reusable, so callers bypass the cache when memory is
+non-empty. Provider errors are never stored.
+
+Configuration (env):
+- RESPONSE_CACHE_SIZE        max cached answers (default 1024, 0 disables)
+- RESPONSE_CACHE_TTL         seconds an answer stays valid (default 3600)
+- RESPONSE_CACHE_MAX_BYTES   total size budget (default 32 MB)
+- RESPONSE_CACHE_SIMILARITY  cosine similarity for semantic hits (unset = off)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.router.route_cache import normalize_query
+from src.utils.ttl_cache import TTLCache
+
+# Per-entry bookkeeping beyond the text itself (rough)
+_ENTRY_OVERHEAD = 200
+
+# Outputs LLM returns when the provider call failed
+_ERROR_MARKERS = ("ERROR: LLM", "[STREAM ERROR]")
+
+_PIECE_RE = re.compile(r"\s*\S+")
+
+Scope = Tuple[Hashable, ...]
+
+
+def replay_tokens(text: str) -> Iterator[str]:
+    """Split a cached answer into word-sized stream deltas."""
+    end = 0
+    for match in _PIECE_RE.finditer(text):
+        end = match.end()
+        yield match.group()
+    if end < len(text):
+        yield text[end:]
+
+
+class ResponseCache:
+    """LRU + TTL + byte-budgeted cache of final answers."""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        maxbytes: Optional[int] = 32 * 1024 * 1024,
+        embedder: Optional[object] = None,
+        similarity_threshold: Optional[float] = None,
+    ) -> None:
+        """Create the cache.
+
+        Args:
+        ----
+            maxsize: Maximum cached answers.
+            ttl: Seconds an answer stays valid (None = forever).
+            maxbytes: Total size budget of the cached answers (None = no limit).
+            embedder: Model exposing encode(); required for semantic lookup.
+            similarity_threshold: Cosine similarity needed to reuse the answer
+                of a different query. None disables semantic lookup.
+
+        """
+        self.semantic = embedder is not None and similarity_threshold is not None
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = TTLCache(
+            maxsize=maxsize,
+            ttl=ttl,
+            on_evict=self._on_evict,
+            maxbytes=maxbytes,
+            sizeof=self._sizeof,
+        )
+
+        # Semantic index: scope -> {normalized query: unit vector}
+        self._vectors: Dict[Scope, Dict[str, np.ndarray]] = {}
+        self._matrices: Dict[Scope, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0}
+
+    @classmethod
+    def from_env(cls, embedder: Optional[object] = None) -> Optional["ResponseCache"]:
+        """Build the cache from env; None when RESPONSE_CACHE_SIZE=0."""
+        size = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+        if size <= 0:
+            return None
+
+        ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        maxbytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        similarity = os.getenv("RESPONSE_CACHE_SIMILARITY")
+
+        return cls(
+            maxsize=size,
+            ttl=ttl if ttl > 0 else None,
+            maxbytes=maxbytes if maxbytes > 0 else None,
+            embedder=embedder,
+            similarity_threshold=float(similarity) if similarity else None,
+        )
+
+    # ---------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------
+    @staticmethod
+    def _sizeof(answer: Dict) -> int:
+        return len(answer["output"].encode("utf-8")) + _ENTRY_OVERHEAD
+
+    def _on_evict(self, key: Tuple[Scope, str], _answer: Dict) -> None:
+        scope, norm = key
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            if vectors is not None and vectors.pop(norm, None) is not None:
+                self._matrices.pop(scope, None)
+                if not vectors:
+                    del self._vectors[scope]
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = self.embedder.encode(
+            [text], convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.asarray(vec, dtype="float32")[0]
+
+    def _nearest(self, scope: Scope, vec: np.ndarray) -> Optional[str]:
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            if not vectors:
+                return None
+            if scope not in self._matrices:
+                keys = list(vectors)
+                self._matrices[scope] = (keys, np.stack([vectors[k] for k in keys]))
+            keys, matrix = self._matrices[scope]
+
+        sims = matrix @ vec
+        best = int(np.argmax(sims))
+        if sims[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def get(self, scope: Scope, query: str) -> Optional[Dict]:
+        """Cached answer {domain, confidence, output, rejection} or None."""
+        norm = normalize_query(query)
+
+        answer = self._entries.get((scope, norm))
+        if answer is not None:
+            self._count("exact_hits")
+            return dict(answer)
+
+        if self.semantic:
+            match = self._nearest(scope, self._embed(norm))
+            if match is not None:
+                answer = self._entries.get((scope, match))
+                if answer is not None:
+                    self._count("semantic_hits")
+                    return dict(answer)
+
+        self._count("misses")
+        return None
+
+    def put(self, scope: Scope, query: str, answer: Dict) -> bool:
+        """Store answer for query; provider errors are skipped (False)."""
+        if not answer["output"] or any(m in answer["output"] for m in _ERROR_MARKERS):
+            return False
+
+        norm = normalize_query(query)
+        self._entries.set((scope, norm), dict(answer))
+
+        # (an answer larger than the whole byte budget isn't kept)
+        if self.semantic and self._entries.get((scope, norm)) is not None:
+            vec = self._embed(norm)
+            with self._lock:
+                self._vectors.setdefault(scope, {})[norm] = vec
+                self._matrices.pop(scope, None)
+        return True
+
+    def bypass(self) -> None:
+        """Count a request that could not use the cache (e.g. has memory)."""
+        self._count("bypassed")
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        stats["size"] = len(self._entries)
+        stats["bytes"] = self._entries.bytes
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
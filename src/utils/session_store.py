@@ -0,0 +1,291 @@
+"""Module: session_store.
+
+Session-keyed conversation memory. Each ChatRequest.session_id gets its
+own ContextManager state instead of every user sharing one global memory.
+
+Backends:
+- InMemorySessionBackend : per-process dict (single worker / dev)
+- SQLiteSessionBackend   : on-disk, shared by every gunicorn worker on the
+                           host, so no sticky routing is needed
+
+Configuration (env):
+- SESSION_BACKEND      "memory" (default) or "sqlite"
+- SESSION_DB_PATH      SQLite file (default "sessions.db")
+- SESSION_MAX          sessions kept before LRU eviction (default 10000,
+                       enforced every 100 writes)
+- SESSION_IDLE_TTL     seconds of inactivity before a session is dropped
+                       (default 3600, 0 disables)
+- SESSION_MAX_ENTRIES  memory lines kept per session (default 12)
+- SESSION_MAX_BYTES    optional per-session memory byte budget
+- SESSION_MAX_TOKENS   verbatim memory token budget (default 1500)
+- SESSION_SUMMARY_TOKENS  running-summary token budget (default 300)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from src.utils.context_manager import ContextManager
+
+# Writes between two eviction sweeps
+_SWEEP_EVERY = 100
+
+
+class SessionBackend(ABC):
+    """Storage for per-session state dicts (ContextManager.to_dict())."""
+
+    def __init__(self, lock_stripes: int = 64) -> None:
+        # Striped locks: per-session mutual exclusion without a lock per id
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    def _lock_for(self, session_id: str) -> threading.Lock:
+        return self._locks[zlib.crc32(session_id.encode("utf-8")) % len(self._locks)]
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict]:
+        """Return the stored state, or None for an unknown session."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, session_id: str, fn: Callable[[Optional[Dict]], Dict]) -> None:
+        """Atomically replace the state with fn(current_state)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def evict(self, max_sessions: int, idle_ttl: Optional[float]) -> int:
+        """Drop idle and least-recently-used sessions; return how many."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class InMemorySessionBackend(SessionBackend):
+    """Process-local backend, ordered by last access for LRU eviction."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._data_lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        with self._data_lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            self._data[session_id] = (time.time(), entry[1])
+            self._data.move_to_end(session_id)
+            return entry[1]
+
+    def update(self, session_id: str, fn: Callable[[Optional[Dict]], Dict]) -> None:
+        with self._lock_for(session_id):
+            state = fn(self.load(session_id))
+            with self._data_lock:
+                self._data[session_id] = (time.time(), state)
+                self._data.move_to_end(session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._data_lock:
+            self._data.pop(session_id, None)
+
+    def evict(self, max_sessions: int, idle_ttl: Optional[float]) -> int:
+        removed = 0
+        with self._data_lock:
+            if idle_ttl:
+                cutoff = time.time() - idle_ttl
+                # Oldest first: stop at the first session that is still fresh
+                while self._data and next(iter(self._data.values()))[0] < cutoff:
+                    self._data.popitem(last=False)
+                    removed += 1
+
+            while len(self._data) > max_sessions:
+                self._data.popitem(last=False)
+                removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """On-disk backend shared across worker processes.
+
+    Read-modify-write runs inside `BEGIN IMMEDIATE`, which serializes writers
+    across processes; the striped in-process locks avoid needless
+    SQLITE_BUSY retries between threads of the same worker.
+    """
+
+    def __init__(self, path: str = "sessions.db", timeout: float = 10.0) -> None:
+        super().__init__()
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " state TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated_at"
+                " ON sessions (updated_at)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT state FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, session_id: str, fn: Callable[[Optional[Dict]], Dict]) -> None:
+        with self._lock_for(session_id):
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state = fn(self.load(session_id))
+                conn.execute(
+                    "INSERT INTO sessions (session_id, state, updated_at)"
+                    " VALUES (?, ?, ?)"
+                    " ON CONFLICT(session_id) DO UPDATE SET"
+                    " state = excluded.state, updated_at = excluded.updated_at",
+                    (session_id, json.dumps(state), time.time()),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def evict(self, max_sessions: int, idle_ttl: Optional[float]) -> int:
+        conn = self._conn()
+        removed = 0
+        if idle_ttl:
+            removed += conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - idle_ttl,)
+            ).rowcount
+        removed += conn.execute(
+            "DELETE FROM sessions WHERE session_id NOT IN ("
+            " SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+            (max_sessions,),
+        ).rowcount
+        return removed
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionStore:
+    """Per-session ContextManager facade used by MultiDomainAssistant."""
+
+    def __init__(
+        self,
+        backend: Optional[SessionBackend] = None,
+        max_sessions: int = 10000,
+        idle_ttl: Optional[float] = 3600.0,
+        max_entries: int = 12,
+        max_bytes: Optional[int] = None,
+        max_tokens: Optional[int] = 1500,
+        summary_tokens: int = 300,
+    ) -> None:
+        self.backend = backend if backend is not None else InMemorySessionBackend()
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+
+        self._writes = 0
+        self._evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        """Build a store from the SESSION_* environment variables."""
+        kind = os.getenv("SESSION_BACKEND", "memory").lower()
+        if kind == "sqlite":
+            backend: SessionBackend = SQLiteSessionBackend(
+                os.getenv("SESSION_DB_PATH", "sessions.db")
+            )
+        else:
+            backend = InMemorySessionBackend()
+
+        idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+        max_bytes = os.getenv("SESSION_MAX_BYTES")
+
+        return cls(
+            backend=backend,
+            max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+            idle_ttl=idle_ttl if idle_ttl > 0 else None,
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "12")),
+            max_bytes=int(max_bytes) if max_bytes else None,
+            max_tokens=int(os.getenv("SESSION_MAX_TOKENS", "1500")),
+            summary_tokens=int(os.getenv("SESSION_SUMMARY_TOKENS", "300")),
+        )
+
+    def _context(self, state: Optional[Dict]) -> ContextManager:
+        return ContextManager.from_dict(
+            state,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            max_tokens=self.max_tokens,
+            summary_tokens=self.summary_tokens,
+        )
+
+    def get(self, session_id: str) -> ContextManager:
+        """Snapshot of the session's memory (mutations are not persisted)."""
+        return self._context(self.backend.load(session_id))
+
+    def build_context(self, session_id: str) -> Dict:
+        return self.get(session_id).build_context()
+
+    def add_memory(self, session_id: str, user_msg: str, assistant_msg: str) -> None:
+        """Append one exchange to the session under its lock."""
+
+        def _append(state: Optional[Dict]) -> Dict:
+            cm = self._context(state)
+            cm.add_memory(user_msg, assistant_msg)
+            return cm.to_dict()
+
+        self.backend.update(session_id, _append)
+
+        self._writes += 1
+        if self._writes % _SWEEP_EVERY == 0:
+            self._evicted += self.backend.evict(self.max_sessions, self.idle_ttl)
+
+    def clear(self, session_id: str) -> None:
+        self.backend.delete(session_id)
+
+    def metrics(self) -> Dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "sessions": len(self.backend),
+            "evicted": self._evicted,
+        }
@@ -0,0 +1,249 @@
+"""Module: single_flight.
+
+Request coalescing: concurrent calls with the same key share one
+execution instead of each hitting the providers.
+
+- do(key, fn): the first caller runs fn(); callers arriving while it is
+  in flight wait for and receive the same result (or exception).
+- stream(key, source): the first caller starts a producer that drains
+  source() into a shared event buffer; every caller (including late
+  joiners) replays the buffer from the start and then follows it live.
+  The producer runs on its own thread/task, so one client disconnecting
+  never cuts the stream short for the others.
+
+A key is forgotten as soon as its execution finishes; later calls start
+a new one (results worth keeping belong in a cache, not here).
+
+SingleFlight is for threads, AsyncSingleFlight for one asyncio loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+)
+
+
+# ---------------------------------------------------------
+# Threads
+# ---------------------------------------------------------
+class _Flight:
+    """Shared state of one execution (result or event buffer)."""
+
+    def __init__(self) -> None:
+        self.events: List[Any] = []
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.done = False
+        self.cond = threading.Condition()
+
+    def publish(self, event: Any) -> None:
+        with self.cond:
+            self.events.append(event)
+            self.cond.notify_all()
+
+    def finish(self, result: Any = None, error: BaseException | None = None) -> None:
+        with self.cond:
+            self.result, self.error, self.done = result, error, True
+            self.cond.notify_all()
+
+    def wait(self) -> Any:
+        with self.cond:
+            self.cond.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def follow(self) -> Iterator[Any]:
+        i = 0
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: i < len(self.events) or self.done)
+                fresh = self.events[i:]
+                done, error = self.done, self.error
+            yield from fresh
+            i += len(fresh)
+            if done and i >= len(self.events):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """Thread-safe single-flight groups."""
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.leaders += 1
+            return flight, True
+
+    def _forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """fn()'s result, shared with concurrent callers of the same key."""
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.wait()
+
+        try:
+            result = fn()
+        except BaseException as err:
+            self._forget(key)
+            flight.finish(error=err)
+            raise
+        self._forget(key)
+        flight.finish(result)
+        return result
+
+    def stream(
+        self, key: Hashable, source: Callable[[], Iterator[Any]]
+    ) -> Iterator[Any]:
+        """Events of source(), shared with concurrent callers of the same key."""
+        flight, leader = self._join(key)
+        if leader:
+            threading.Thread(
+                target=self._pump, args=(key, flight, source), daemon=True
+            ).start()
+        return flight.follow()
+
+    def _pump(self, key: Hashable, flight: _Flight, source) -> None:
+        try:
+            for event in source():
+                flight.publish(event)
+        except BaseException as err:
+            self._forget(key)
+            flight.finish(error=err)
+            return
+        self._forget(key)
+        flight.finish()
+
+    def metrics(self) -> Dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
+
+
+# ---------------------------------------------------------
+# asyncio
+# ---------------------------------------------------------
+class _AsyncFlight:
+    """Event buffer of one async stream execution."""
+
+    def __init__(self) -> None:
+        self.events: List[Any] = []
+        self.error: BaseException | None = None
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Any) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.error, self.done = error, True
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        i = 0
+        while True:
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class AsyncSingleFlight:
+    """Single-flight groups for coroutines on one event loop."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, _AsyncFlight] = {}
+        # Strong references: the loop only keeps weak ones to tasks
+        self._pumps: Set[asyncio.Future] = set()
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """await fn()'s result, shared with concurrent callers of the same key.
+
+        The shared task is shielded: a caller being cancelled doesn't
+        cancel it for the others.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stream(
+        self, key: Hashable, source: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """Events of source(), shared with concurrent callers of the same key."""
+        flight = self._streams.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = self._streams[key] = _AsyncFlight()
+            pump = asyncio.ensure_future(self._pump(key, flight, source))
+            self._pumps.add(pump)
+            pump.add_done_callback(self._pumps.discard)
+        else:
+            self.coalesced += 1
+        return flight.follow()
+
+    async def _pump(self, key: Hashable, flight: _AsyncFlight, source) -> None:
+        try:
+            async for event in source():
+                flight.publish(event)
+        except BaseException as err:
+            self._streams.pop(key, None)
+            flight.finish(err)
+            if isinstance(err, asyncio.CancelledError):
+                raise
+            return
+        self._streams.pop(key, None)
+        flight.finish()
+
+    def metrics(self) -> Dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._tasks) + len(self._streams),
+        }
@@ -0,0 +1,121 @@
+"""Module: speculation.
+
+Speculative token streams: generation starts in the background before
+the caller knows whether it wants the result, and is buffered until it
+is either accepted (tokens(): the buffer, then the live stream) or
+cancelled (cancel(): stops the producer, which closes the provider
+request, and returns the text that was wasted).
+
+Speculation runs the producer in a daemon thread, AsyncSpeculation in a
+task on the current event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterator, List
+
+
+class Speculation:
+    """A token stream produced ahead of time in a worker thread."""
+
+    def __init__(self, source: Callable[[], Iterator[str]]) -> None:
+        self._tokens: List[str] = []
+        self._error: BaseException | None = None
+        self._done = False
+        self._cond = threading.Condition()
+        self._cancelled = threading.Event()
+        threading.Thread(target=self._run, args=(source,), daemon=True).start()
+
+    def _run(self, source: Callable[[], Iterator[str]]) -> None:
+        stream = None
+        try:
+            stream = source()
+            for token in stream:
+                if self._cancelled.is_set():
+                    break
+                with self._cond:
+                    self._tokens.append(token)
+                    self._cond.notify_all()
+        except BaseException as err:
+            self._error = err
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def cancel(self) -> str:
+        """Stop generating; returns the text produced so far."""
+        self._cancelled.set()
+        with self._cond:
+            return "".join(self._tokens)
+
+    def tokens(self) -> Iterator[str]:
+        """Buffered tokens, then the rest as they are produced."""
+        i = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: i < len(self._tokens) or self._done)
+                fresh = self._tokens[i:]
+                done = self._done
+            yield from fresh
+            i += len(fresh)
+            if done:
+                if self._error is not None:
+                    raise self._error
+                return
+
+
+class AsyncSpeculation:
+    """A token stream produced ahead of time in an asyncio task."""
+
+    def __init__(self, source: Callable[[], AsyncIterator[str]]) -> None:
+        self._tokens: List[str] = []
+        self._error: BaseException | None = None
+        self._done = False
+        self._changed = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run(source))
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _run(self, source: Callable[[], AsyncIterator[str]]) -> None:
+        stream = None
+        try:
+            stream = source()
+            async for token in stream:
+                self._tokens.append(token)
+                self._notify()
+        except asyncio.CancelledError:
+            pass
+        except Exception as err:
+            self._error = err
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._done = True
+            self._notify()
+
+    def cancel(self) -> str:
+        """Stop generating; returns the text produced so far."""
+        self._task.cancel()
+        return "".join(self._tokens)
+
+    async def tokens(self) -> AsyncIterator[str]:
+        """Buffered tokens, then the rest as they are produced."""
+        i = 0
+        while True:
+            while i < len(self._tokens):
+                yield self._tokens[i]
+                i += 1
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            await self._changed.wait()
@@ -0,0 +1,68 @@
+"""Module: stage_timings.
+
+Rolling per-stage latency statistics for the request pipeline (route,
+retrieve, generate, ...), reported by /metrics.
+
+Each stage keeps its last `window` samples; percentiles are computed
+over that window, counts and totals over the process lifetime.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+import numpy as np
+
+
+class StageTimings:
+    """Thread-safe latency recorder keyed by stage name."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(ms)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+            self._totals[stage] = self._totals.get(stage, 0.0) + ms
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Record the wall time of the with-block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def metrics(self) -> Dict[str, Dict]:
+        """{stage: {count, avg_ms, p50_ms, p95_ms, max_ms}}."""
+        with self._lock:
+            snapshot = {
+                stage: (np.array(samples), self._counts[stage], self._totals[stage])
+                for stage, samples in self._samples.items()
+            }
+
+        report = {}
+        for stage, (samples, count, total) in snapshot.items():
+            p50, p95 = np.percentile(samples, [50, 95])
+            report[stage] = {
+                "count": count,
+                "avg_ms": round(total / count, 2),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "max_ms": round(float(samples.max()), 2),
+            }
+        return report
@@ -0,0 +1,63 @@
+"""Module: tokens.
+
+Cached token counting for prompt budgeting.
+
+Uses tiktoken (cl100k_base, close enough for both GPT and Llama 3 prompt
+sizing) when it is installed and its encoding can be loaded; otherwise
+falls back to a ~4 characters per token estimate. The encoder is loaded
+once per process and counts for repeated strings (memory turns, RAG
+chunks, template boilerplate) are memoized.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from functools import lru_cache
+from typing import Optional
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+# Characters per token for the heuristic fallback
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def get_encoder() -> Optional[object]:
+    """Load the tiktoken encoder once; None means "use the heuristic"."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as err:
+        LOGGER.warning(f"tiktoken unavailable ({err}); estimating token counts")
+        return None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Number of tokens in text."""
+    if not text:
+        return 0
+
+    encoder = get_encoder()
+    if encoder is None:
+        return max(1, len(text) // _CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, suffix: str = " …") -> str:
+    """Cut text down to at most max_tokens tokens (suffix marks the cut)."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoder = get_encoder()
+    if encoder is None:
+        return text[: max_tokens * _CHARS_PER_TOKEN].rstrip() + suffix
+    tokens = encoder.encode(text, disallowed_special=())
+    return encoder.decode(tokens[:max_tokens]).rstrip() + suffix
@@ -0,0 +1,120 @@
+"""Module: ttl_cache.
+
+Small thread-safe LRU cache with optional per-entry time-to-live, shared
+by the router, retrieval and response caches.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        maxbytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ) -> None:
+        """Create the cache.
+
+        Args:
+        ----
+            maxsize: Maximum number of entries before LRU eviction.
+            ttl: Seconds an entry stays valid; None disables expiry.
+            on_evict: Called with (key, value) whenever an entry is dropped
+                (LRU, expiry, overwrite or explicit removal).
+            maxbytes: Optional total size budget, also enforced by LRU
+                eviction (needs sizeof).
+            sizeof: value -> size in bytes, for maxbytes.
+
+        """
+        if maxbytes is not None and sizeof is None:
+            raise ValueError("maxbytes needs a sizeof function")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _expired(self, expires_at: float) -> bool:
+        return self.ttl is not None and expires_at < time.monotonic()
+
+    def _drop(self, key: Hashable) -> None:
+        _, value = self._data.pop(key)
+        if self.sizeof is not None:
+            self.bytes -= self.sizeof(value)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the live value for key (refreshing its LRU position)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            if self._expired(entry[0]):
+                self._drop(key)
+                return default
+
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Insert or replace key, evicting least-recently-used entries."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else 0.0
+
+        size = self.sizeof(value) if self.sizeof is not None else 0
+
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+            # Never flush the whole cache for one oversized value
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+
+            self._data[key] = (expires_at, value)
+            self.bytes += size
+
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self.bytes > self.maxbytes
+            ):
+                self._drop(next(iter(self._data)))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not)."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][1]
+            self._drop(key)
+            return value
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of live (key, value) pairs, purging expired ones."""
+        with self._lock:
+            for key in [k for k, (exp, _) in self._data.items() if self._expired(exp)]:
+                self._drop(key)
+            return [(k, v) for k, (_, v) in self._data.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._data):
+                self._drop(key)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,45 @@
+"""Tests for streaming document loading (TXT blocks, parallel PDF pages)."""
+
+from __future__ import annotations
+
+from PyPDF2 import PdfWriter
+
+from src.rag import loader
+from src.rag.loader import DocumentLoader
+
+
+def test_txt_without_whitespace_is_cut_at_bounded_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "TXT_BLOCK_CHARS", 1000)
+    path = tmp_path / "blob.txt"
+    path.write_text("x" * 10_000 + " tail")
+
+    blocks = [text for _, text in DocumentLoader().iter_pages(str(path))]
+
+    assert "".join(blocks) == path.read_text()
+    assert max(len(block) for block in blocks) <= 2 * 1000
+
+
+def _blank_pdf(path, pages: int) -> str:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=100, height=100)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_parallel_pdf_loads_share_one_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "PDF_WORKERS", 2)
+    monkeypatch.setattr(loader, "PDF_PARALLEL_MIN_PAGES", 2)
+    first = _blank_pdf(tmp_path / "first.pdf", 5)
+    second = _blank_pdf(tmp_path / "second.pdf", 7)
+    docs = DocumentLoader()
+
+    assert [n for n, _ in docs.iter_pages(first)] == [1, 2, 3, 4, 5]
+    pool = loader._PDF_POOL
+    # Abandoning a load mid-way leaves the pool usable for the next one
+    pages = docs.iter_pages(second)
+    next(pages)
+    pages.close()
+    assert [n for n, _ in docs.iter_pages(second)] == list(range(1, 8))
+    assert loader._PDF_POOL is pool
@@ -0,0 +1,108 @@
+"""Regression tests for RAGPipeline ingestion (no embedding model needed)."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from functools import partial
+
+import numpy as np
+import pytest
+
+from src.rag import rag_pipeline, vectorstore
+from src.rag.chunker import Chunker
+from src.rag.embedding_service import EmbeddingService
+from src.rag.loader import DocumentLoader
+from src.rag.rag_pipeline import RAGPipeline
+
+DIM = 16
+
+
+def _fake_embed(texts, cache=True):
+    vectors = np.zeros((len(texts), DIM), dtype="float32")
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % DIM] += 1
+    return vectors + 1e-3
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _make_pipeline(monkeypatch, tmp_path, index_dir: str = "") -> RAGPipeline:
+    # Small batches so every background parser fills its queue
+    monkeypatch.setattr(rag_pipeline, "RAG_INGEST_BATCH", 2)
+    monkeypatch.setattr(rag_pipeline, "RAG_PARSE_WORKERS", 2)
+    # Keep the embedding cache out of the working directory
+    monkeypatch.setattr(
+        vectorstore,
+        "EmbeddingService",
+        partial(EmbeddingService, cache_path=str(tmp_path / "embeddings.db")),
+    )
+
+    rag = RAGPipeline(index_dir=index_dir)
+    rag.vectorstore._embed = _fake_embed
+    rag.loader = DocumentLoader(
+        Chunker(chunk_tokens=20, overlap_tokens=0, token_counter=_word_count)
+    )
+    return rag
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    return _make_pipeline(monkeypatch, tmp_path)
+
+
+def _write(path, topic: str, n: int = 120) -> str:
+    path.write_text(" ".join(f"Sentence {i} is about {topic}." for i in range(n)))
+    return str(path)
+
+
+def test_same_content_files_in_one_call_do_not_hang(pipeline, tmp_path):
+    copies = [_write(tmp_path / f"copy{i}.txt", "pears") for i in range(3)]
+    fresh = _write(tmp_path / "fresh.txt", "kiwis")
+
+    result = []
+    worker = threading.Thread(
+        target=lambda: result.append(pipeline.add_documents(copies + [fresh])),
+        daemon=True,
+    )
+    worker.start()
+    worker.join(timeout=30)
+
+    assert not worker.is_alive(), "add_documents() hung on duplicate files"
+    assert result[0] > 0
+    assert set(pipeline.vectorstore.doc_ids) == {copies[0], fresh}
+    assert pipeline.dedup.skipped_documents == 2
+
+
+def test_cancelled_parse_stops_iteration():
+    parse = rag_pipeline._BackgroundParse(iter([]))
+    parse.cancel()
+    assert list(parse) == []
+
+
+def test_failed_ingest_restores_saved_index(monkeypatch, tmp_path):
+    rag = _make_pipeline(monkeypatch, tmp_path, index_dir=str(tmp_path / "index"))
+    doc = _write(tmp_path / "doc.txt", "pears")
+    rag.add_documents([doc])
+    rag.save()
+    chunks, version = len(rag.vectorstore), rag.corpus_version
+
+    def broken(path):
+        for i, chunk in enumerate(DocumentLoader.iter_chunks(rag.loader, path)):
+            if i == 5:
+                raise OSError("disk went away")
+            yield chunk
+
+    # A new version of the same document fails partway through parsing
+    _write(tmp_path / "doc.txt", "kiwis")
+    monkeypatch.setattr(rag.loader, "iter_chunks", broken)
+    with pytest.raises(OSError):
+        rag.add_documents([doc])
+
+    assert len(rag.vectorstore) == chunks
+    assert list(rag.vectorstore.doc_ids) == [doc]
+    assert "pears" in rag.vectorstore.search("pears", top_k=1, min_score=0)[0][0]
+    assert rag.corpus_version > version
@@ -0,0 +1,220 @@
+"""Tests for request coalescing (SingleFlight / AsyncSingleFlight)."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.single_flight import AsyncSingleFlight, SingleFlight
+
+N = 5
+
+
+# ---------------------------------------------------------
+# Threads
+# ---------------------------------------------------------
+def _run_callers(fn, n: int = N):
+    """Call fn() from n threads; returns {index: result or exception}."""
+    results = {}
+
+    def call(i):
+        try:
+            results[i] = fn()
+        except Exception as err:
+            results[i] = err
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def _wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition never became true"
+        time.sleep(0.01)
+
+
+def test_do_runs_once_for_concurrent_callers():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    # Let go of the leader only once every caller has joined the flight
+    threading.Thread(
+        target=lambda: (_wait_for(lambda: flights.coalesced == N - 1), release.set()),
+        daemon=True,
+    ).start()
+    results = _run_callers(lambda: flights.do("key", work))
+
+    assert len(calls) == 1
+    assert list(results.values()) == ["answer"] * N
+    assert flights.metrics() == {"leaders": 1, "coalesced": N - 1, "in_flight": 0}
+
+
+def test_do_error_reaches_every_waiter():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise RuntimeError("provider down")
+
+    threading.Thread(
+        target=lambda: (_wait_for(lambda: flights.coalesced == N - 1), release.set()),
+        daemon=True,
+    ).start()
+    results = _run_callers(lambda: flights.do("key", work))
+
+    assert len(results) == N
+    assert all(isinstance(r, RuntimeError) for r in results.values())
+    assert flights.leaders == 1
+
+
+def test_key_is_forgotten_after_the_flight():
+    flights = SingleFlight()
+    assert flights.do("key", lambda: 1) == 1
+    assert flights.do("key", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flights.do("key", lambda: (_ for _ in ()).throw(ValueError()))
+    assert flights.do("key", lambda: 3) == 3
+    assert flights.metrics() == {"leaders": 4, "coalesced": 0, "in_flight": 0}
+
+
+def test_late_stream_joiner_replays_the_buffer():
+    flights = SingleFlight()
+    halfway = threading.Event()
+    release = threading.Event()
+
+    def source():
+        yield "a"
+        yield "b"
+        halfway.set()
+        release.wait(5)
+        yield "c"
+
+    first = flights.stream("key", source)
+    assert halfway.wait(5)
+    late = flights.stream("key", source)
+    release.set()
+
+    assert list(first) == ["a", "b", "c"]
+    assert list(late) == ["a", "b", "c"]
+    assert (flights.leaders, flights.coalesced) == (1, 1)
+    _wait_for(lambda: flights.metrics()["in_flight"] == 0)
+
+
+def test_abandoned_stream_keeps_going_for_others():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def source():
+        yield "a"
+        release.wait(5)
+        yield "b"
+
+    quitter = flights.stream("key", source)
+    assert next(quitter) == "a"
+    quitter.close()
+    stayer = flights.stream("key", source)
+    release.set()
+
+    assert list(stayer) == ["a", "b"]
+
+
+# ---------------------------------------------------------
+# asyncio
+# ---------------------------------------------------------
+def test_async_do_runs_once_for_concurrent_callers():
+    async def main():
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(N)))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == ["answer"] * N
+    assert flights.metrics() == {"leaders": 1, "coalesced": N - 1, "in_flight": 0}
+
+
+def test_async_do_error_reaches_every_waiter():
+    async def main():
+        flights = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("provider down")
+
+        return await asyncio.gather(
+            *(flights.do("key", work) for _ in range(N)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_async_cancelled_follower_does_not_cancel_the_shared_task():
+    async def main():
+        flights = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flights.do("key", work))
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return flights, follower, await leader
+
+    flights, follower, answer = asyncio.run(main())
+    assert follower.cancelled()
+    assert answer == "answer"
+    assert flights.metrics()["in_flight"] == 0
+
+
+def test_async_late_stream_joiner_replays_the_buffer():
+    async def main():
+        flights = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def source():
+            yield "a"
+            yield "b"
+            await release.wait()
+            yield "c"
+
+        async def collect(stream):
+            return [event async for event in stream]
+
+        first = asyncio.ensure_future(collect(flights.stream("key", source)))
+        await asyncio.sleep(0.01)
+        late = asyncio.ensure_future(collect(flights.stream("key", source)))
+        await asyncio.sleep(0.01)
+        release.set()
+        return flights, await first, await late
+
+    flights, first, late = asyncio.run(main())
+    assert first == late == ["a", "b", "c"]
+    assert flights.metrics() == {"leaders": 1, "coalesced": 1, "in_flight": 0}
@@ -0,0 +1,166 @@
+"""Tests for speculative generation for the selected domain."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src import main
+from src.main import MultiDomainAssistant
+from src.utils.speculation import AsyncSpeculation, Speculation
+from src.utils.stage_timings import StageTimings
+
+TOKENS = ["Aspirin ", "thins ", "the ", "blood."]
+
+
+class _Agent:
+    """Streams TOKENS slowly; closed is set once the stream is closed."""
+
+    rag = None
+
+    def __init__(self) -> None:
+        self.closed = threading.Event()
+
+    def stream(self, query, context, hits=None):
+        try:
+            for token in TOKENS:
+                yield token
+                time.sleep(0.02)
+        finally:
+            self.closed.set()
+
+    async def astream(self, query, context, hits=None):
+        try:
+            for token in TOKENS:
+                yield token
+                await asyncio.sleep(0.02)
+        finally:
+            self.closed.set()
+
+
+class _Router:
+    """Decides for domain after delay seconds; gate is an exception to raise
+    (route) or an asyncio.Event to wait for (aroute).
+    """
+
+    def __init__(self, domain: str, delay: float = 0.0, gate=None) -> None:
+        self.decision = {"domain": domain, "confidence": 0.95, "reason": ""}
+        self.delay = delay
+        self.gate = gate
+
+    def route(self, query):
+        time.sleep(self.delay)
+        if isinstance(self.gate, BaseException):
+            raise self.gate
+        return dict(self.decision)
+
+    async def aroute(self, query):
+        if self.gate is not None:
+            await self.gate.wait()
+        return dict(self.decision)
+
+
+def _assistant(monkeypatch, router: _Router) -> MultiDomainAssistant:
+    """An assistant with fake agents/router and no RAG, cache or sessions."""
+    monkeypatch.setattr(main, "SPECULATIVE_DOMAIN", True)
+    assistant = object.__new__(MultiDomainAssistant)
+    assistant.agents = {"medical": _Agent(), "legal": _Agent(), "general": _Agent()}
+    assistant.router = router
+    assistant.responses = None
+    assistant._prefetch_pool = None
+    assistant._prefetch_stats = {"used": 0, "discarded": 0, "failed": 0}
+    assistant._speculation_stats = {"hits": 0, "cancelled": 0, "cancelled_tokens": 0}
+    assistant._stats_lock = threading.Lock()
+    assistant.timings = StageTimings()
+    return assistant
+
+
+# ---------------------------------------------------------
+# Speculation / AsyncSpeculation
+# ---------------------------------------------------------
+def test_accepted_speculation_yields_every_token():
+    speculation = Speculation(lambda: iter(TOKENS))
+    assert list(speculation.tokens()) == TOKENS
+
+
+def test_cancelled_speculation_stops_and_closes_the_stream():
+    agent = _Agent()
+    speculation = Speculation(lambda: agent.stream("q", {}))
+    speculation.cancel()
+
+    assert agent.closed.wait(5)
+    assert len(list(speculation.tokens())) < len(TOKENS)
+
+
+def test_cancelled_async_speculation_closes_the_stream():
+    async def run():
+        agent = _Agent()
+        speculation = AsyncSpeculation(lambda: agent.astream("q", {}))
+        await asyncio.sleep(0.03)
+        wasted = speculation.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return agent, wasted
+
+    agent, wasted = asyncio.run(run())
+    assert agent.closed.is_set()
+    assert wasted.startswith(TOKENS[0])
+    assert wasted != "".join(TOKENS)
+
+
+# ---------------------------------------------------------
+# Settling against the router's decision
+# ---------------------------------------------------------
+def test_router_agreeing_keeps_the_speculation(monkeypatch):
+    assistant = _assistant(monkeypatch, _Router("medical"))
+    answer = assistant._generate("Is aspirin safe?", "medical", {}, None)
+
+    assert answer["output"] == "".join(TOKENS).strip()
+    assert assistant._speculation_metrics()["hits"] == 1
+    assert assistant._speculation_metrics()["cancelled"] == 0
+
+
+def test_router_overruling_cancels_and_counts_waste(monkeypatch):
+    # The speculation gets a head start before the router answers
+    assistant = _assistant(monkeypatch, _Router("legal", delay=0.03))
+    answer = assistant._generate("Can I sue my doctor?", "medical", {}, None)
+
+    stats = assistant._speculation_metrics()
+    assert answer["rejection"] is True
+    assert (stats["hits"], stats["cancelled"]) == (0, 1)
+    assert stats["cancelled_tokens"] > 0
+    assert assistant.agents["medical"].closed.wait(5)
+
+
+def test_failed_routing_cancels_the_speculation(monkeypatch):
+    router = _Router("medical", gate=RuntimeError("router down"))
+    assistant = _assistant(monkeypatch, router)
+    with pytest.raises(RuntimeError):
+        assistant._generate("Is aspirin safe?", "medical", {}, None)
+
+    assert assistant._speculation_metrics()["cancelled"] == 1
+    assert assistant.agents["medical"].closed.wait(5)
+
+
+def test_caller_cancelled_mid_route_cancels_the_speculation(monkeypatch):
+    async def run():
+        assistant = _assistant(monkeypatch, _Router("medical", gate=asyncio.Event()))
+        task = asyncio.ensure_future(
+            assistant._agenerate("Is aspirin safe?", "medical", {}, None)
+        )
+        await asyncio.sleep(0.03)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return assistant
+
+    assistant = asyncio.run(run())
+    stats = assistant._speculation_metrics()
+    assert (stats["hits"], stats["cancelled"]) == (0, 1)
+    assert stats["cancelled_tokens"] > 0
+    assert assistant.agents["medical"].closed.is_set()